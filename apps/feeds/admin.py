@@ -1,7 +1,8 @@
 from django.contrib import admin
 
-from .models import Feed, FeedItem, Comment
+from .models import Feed, Entry, FeedItem, Comment
 
 admin.site.register(Feed)
+admin.site.register(Entry)
 admin.site.register(FeedItem)
 admin.site.register(Comment)
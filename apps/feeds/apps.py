@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 
 class FeedsConfig(AppConfig):
-    name = 'feeds'
+    name = 'apps.feeds'
+    label = 'feeds'
+
+    def ready(self):
+        from apps.feeds import signals  # noqa: F401
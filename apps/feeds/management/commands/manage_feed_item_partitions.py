@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from apps.feeds.partitions import apply_retention, create_partitions
+
+
+class Command(BaseCommand):
+    help = 'Create Future Feed Item Partitions And Drop Expired Ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ahead', type=int, default=settings.FEED_ITEM_PARTITIONS_AHEAD,
+            help='Months after the current one to create partitions for')
+        parser.add_argument(
+            '--retention', type=int,
+            default=settings.FEED_ITEM_RETENTION_MONTHS,
+            help='Months before the current one to keep partitions of')
+        parser.add_argument(
+            '--no-retention', action='store_true',
+            help='Only create partitions')
+
+    def handle(self, *args, **options):
+        """
+
+        :param args:
+        :param options:
+        :return:
+        """
+
+        if options['ahead'] < 0:
+            raise CommandError('--ahead must not be negative')
+        for name in create_partitions(options['ahead']):
+            self.stdout.write(f'Created partition {name}')
+        if options['no_retention'] or options['retention'] is None:
+            return
+        if options['retention'] < 0:
+            raise CommandError('--retention must not be negative')
+        result = apply_retention(options['retention'])
+        for name in result['dropped']:
+            self.stdout.write(f'Dropped partition {name}')
+        self.stdout.write(
+            f"Kept {result['kept']} feed items, deleted {result['deleted']} "
+            f"feed items and {result['entries']} entries")
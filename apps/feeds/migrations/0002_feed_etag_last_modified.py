@@ -0,0 +1,23 @@
+# Generated by Django 3.0.12 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='etag',
+            field=models.CharField(blank=True, max_length=200, null=True, verbose_name='ETag'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='last_modified',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Last Modified'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.0.12 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0002_feed_etag_last_modified'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Lease Expires'),
+        ),
+        migrations.AddField(
+            model_name='feed',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Lease Owner'),
+        ),
+        migrations.AddIndex(
+            model_name='feed',
+            index=models.Index(condition=models.Q(terminated=False), fields=['scan_after'], name='feed_scan_after_due_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.12 on 2026-10-18 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0003_feed_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feed',
+            name='content_digest',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Content Digest'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.0.12 on 2026-10-18 12:05
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0004_feed_content_digest'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['category'], name='feed_item_category_gin'),
+        ),
+    ]
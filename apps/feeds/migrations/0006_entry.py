@@ -0,0 +1,49 @@
+# Generated by Django 3.0.12 on 2026-10-18 14:10
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0005_feed_item_category_gin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.URLField(verbose_name='Source')),
+                ('title', models.CharField(max_length=200, verbose_name='Title')),
+                ('description', models.TextField(max_length=1000, verbose_name='Description')),
+                ('link', models.URLField(verbose_name='Link')),
+                ('category', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=100), size=50, verbose_name='Categories')),
+                ('guid', models.CharField(max_length=200, verbose_name='Globally Unique Identifier')),
+                ('pub_date', models.DateTimeField(verbose_name='Pub. Date')),
+                ('author', models.CharField(blank=True, max_length=100, null=True, verbose_name='Author')),
+                ('creator', models.CharField(blank=True, max_length=100, null=True, verbose_name='Creator')),
+                ('rights', models.CharField(blank=True, max_length=200, null=True, verbose_name='Rights')),
+                ('enclosure', models.URLField(blank=True, max_length=500, null=True, verbose_name='Cover Image')),
+                ('related_links', django.contrib.postgres.fields.ArrayField(base_field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=200), size=2), blank=True, null=True, size=30, verbose_name='Related URLs Representation')),
+                ('create_date', models.DateTimeField(auto_now_add=True, verbose_name='Creation Date')),
+            ],
+            options={
+                'db_table': 'entry',
+                'ordering': ['-pub_date'],
+                'unique_together': {('source', 'guid')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['category'], name='entry_category_gin'),
+        ),
+        migrations.AddField(
+            model_name='feeditem',
+            name='entry',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='feeds.Entry'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.0.12 on 2026-10-18 14:10
+
+from django.db import migrations
+
+ENTRY_COLUMNS = ['title', 'description', 'link', 'category', 'guid',
+                 'pub_date', 'author', 'creator', 'rights', 'enclosure',
+                 'related_links']
+
+# Every item is stored once per source url and guid, the earliest copy wins
+COPY_ENTRIES = (
+    f'INSERT INTO entry (source, {", ".join(ENTRY_COLUMNS)}, create_date) '
+    f'SELECT DISTINCT ON (feed.link, feed_item.guid) feed.link, ' +
+    ', '.join(f'feed_item.{name}' for name in ENTRY_COLUMNS) +
+    ', feed_item.create_date '
+    'FROM feed_item JOIN feed ON feed.id = feed_item.feed_id '
+    'ORDER BY feed.link, feed_item.guid, feed_item.create_date')
+
+LINK_ENTRIES = (
+    'UPDATE feed_item SET entry_id = entry.id FROM feed, entry '
+    'WHERE feed.id = feed_item.feed_id AND entry.source = feed.link '
+    'AND entry.guid = feed_item.guid')
+
+RESTORE_ITEMS = (
+    'UPDATE feed_item SET ' +
+    ', '.join(f'{name} = entry.{name}' for name in ENTRY_COLUMNS) +
+    ' FROM entry WHERE entry.id = feed_item.entry_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0006_entry'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            [COPY_ENTRIES, LINK_ENTRIES],
+            [RESTORE_ITEMS, 'UPDATE feed_item SET entry_id = NULL',
+             'DELETE FROM entry'],
+        ),
+    ]
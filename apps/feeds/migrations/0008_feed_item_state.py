@@ -0,0 +1,67 @@
+# Generated by Django 3.0.12 on 2026-10-18 14:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0007_feed_item_entry_data'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feeditem',
+            name='entry',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='feeds.Entry'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='feeditem',
+            unique_together={('entry', 'user')},
+        ),
+        migrations.RemoveIndex(
+            model_name='feeditem',
+            name='feed_item_category_gin',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='author',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='category',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='creator',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='description',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='enclosure',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='guid',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='link',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='related_links',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='rights',
+        ),
+        migrations.RemoveField(
+            model_name='feeditem',
+            name='title',
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 3.0.12 on 2026-10-18 15:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+FOREIGN_KEYS = [('entry_id', 'entry'), ('feed_id', 'feed'),
+                ('user_id', 'auth_user')]
+
+# feed_item is range partitioned by month on create_date. Rows outside of
+# every monthly partition end up in the default partition feed_item_keep,
+# which keeps favorited and commented items of dropped months. Unique
+# constraints of a partitioned table must contain the partition key, so the
+# primary key is (id, create_date) and (entry, user) isn't unique anymore.
+PARTITION_ITEMS = [
+    'ALTER TABLE feed_item RENAME TO feed_item_old',
+    'CREATE TABLE feed_item (LIKE feed_item_old INCLUDING DEFAULTS) '
+    'PARTITION BY RANGE (create_date)',
+    'ALTER TABLE feed_item ADD PRIMARY KEY (id, create_date)',
+    'CREATE TABLE feed_item_keep PARTITION OF feed_item DEFAULT',
+    '''
+    DO $$
+    DECLARE
+        month timestamp := date_trunc('month', LEAST(
+            (SELECT min(create_date) FROM feed_item_old), now())
+            AT TIME ZONE 'UTC');
+    BEGIN
+        WHILE month <= date_trunc('month', now() AT TIME ZONE 'UTC') +
+                       interval '2 months' LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF feed_item '
+                'FOR VALUES FROM (%L) TO (%L)',
+                'feed_item_' || to_char(month, '"y"YYYY"m"MM'),
+                month AT TIME ZONE 'UTC',
+                (month + interval '1 month') AT TIME ZONE 'UTC');
+            month := month + interval '1 month';
+        END LOOP;
+    END $$
+    ''',
+    'INSERT INTO feed_item SELECT * FROM feed_item_old',
+    'ALTER SEQUENCE feed_item_id_seq OWNED BY feed_item.id',
+    'DROP TABLE feed_item_old',
+] + [
+    f'CREATE INDEX feed_item_{column} ON feed_item ({column})'
+    for column in ('feed_id', 'user_id')
+] + [
+    f'ALTER TABLE feed_item ADD CONSTRAINT feed_item_{column}_fk '
+    f'FOREIGN KEY ({column}) REFERENCES {table} (id) '
+    f'DEFERRABLE INITIALLY DEFERRED'
+    for column, table in FOREIGN_KEYS
+]
+
+UNPARTITION_ITEMS = [
+    'ALTER TABLE feed_item RENAME TO feed_item_partitioned',
+    'CREATE TABLE feed_item (LIKE feed_item_partitioned INCLUDING DEFAULTS)',
+    'ALTER TABLE feed_item ADD PRIMARY KEY (id)',
+    'INSERT INTO feed_item SELECT * FROM feed_item_partitioned',
+    'ALTER SEQUENCE feed_item_id_seq OWNED BY feed_item.id',
+    'DROP TABLE feed_item_partitioned',
+] + [
+    f'CREATE INDEX feed_item_{column} ON feed_item ({column})'
+    for column in ('entry_id', 'feed_id', 'user_id')
+] + [
+    f'ALTER TABLE feed_item ADD CONSTRAINT feed_item_{column}_fk '
+    f'FOREIGN KEY ({column}) REFERENCES {table} (id) '
+    f'DEFERRABLE INITIALLY DEFERRED'
+    for column, table in FOREIGN_KEYS
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0008_feed_item_state'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='feed_item',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='feeds.FeedItem'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='feeditem',
+            unique_together=set(),
+        ),
+        migrations.RunSQL(PARTITION_ITEMS, UNPARTITION_ITEMS),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['entry', 'user'], name='feed_item_entry_user_idx'),
+        ),
+    ]
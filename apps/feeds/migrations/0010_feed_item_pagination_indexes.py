@@ -0,0 +1,21 @@
+# Generated by Django 3.0.12 on 2026-10-18 16:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feeds', '0009_feed_item_partitions'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-id'], name='feed_item_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['feed', '-pub_date', '-id'], name='feed_item_feed_pub_date_idx'),
+        ),
+    ]
@@ -1,5 +1,26 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
+
+from apps.feeds.pagination import paginate_keyset
 
 
 class AuthRequiredMixin(LoginRequiredMixin):
     login_url = '/users/login/'
+
+
+class KeysetPaginationMixin:
+    """
+    Paginates feed item list views by position instead of page number
+
+    Pages are addressed by the after and before tokens of the query string,
+    items aren't counted.
+    """
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = paginate_keyset(queryset, page_size,
+                                   self.request.GET.get('after') or None,
+                                   self.request.GET.get('before') or None)
+        except ValueError as e:
+            raise Http404(str(e))
+        return None, page, page.object_list, page.has_other_pages()
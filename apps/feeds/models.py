@@ -1,6 +1,7 @@
 from django.contrib.auth.models import User
 from django.contrib.postgres import fields
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models, connection
 from django.utils import timezone
 from django.conf import settings
 
@@ -32,6 +33,16 @@ class Feed(models.Model):
     scan_after = models.DateTimeField(verbose_name='Scan After DT', blank=True,
                                       auto_now_add=True)
     terminated = models.BooleanField(verbose_name='Terminated', default=False)
+    etag = models.CharField(verbose_name='ETag', max_length=200, null=True,
+                            blank=True)
+    last_modified = models.CharField(verbose_name='Last Modified',
+                                     max_length=100, null=True, blank=True)
+    content_digest = models.CharField(verbose_name='Content Digest',
+                                      max_length=64, null=True, blank=True)
+    lease_owner = models.CharField(verbose_name='Lease Owner', max_length=100,
+                                   null=True, blank=True)
+    lease_expires = models.DateTimeField(verbose_name='Lease Expires',
+                                         null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE,
                              related_name="feeds")
 
@@ -39,6 +50,10 @@ class Feed(models.Model):
         db_table = 'feed'
         ordering = ['-last_build_date']
         unique_together = [['link', 'user']]
+        indexes = [
+            models.Index(fields=['scan_after'], name='feed_scan_after_due_idx',
+                         condition=models.Q(terminated=False)),
+        ]
 
     def __str__(self):
         return self.title or self.link
@@ -52,7 +67,8 @@ class Feed(models.Model):
         self.save()
 
 
-class FeedItem(models.Model):
+class Entry(models.Model):
+    source = models.URLField(verbose_name='Source', max_length=200)
     title = models.CharField(verbose_name='Title', max_length=200)
     description = models.TextField(verbose_name='Description', max_length=1000)
     link = models.URLField(verbose_name='Link', max_length=200)
@@ -73,8 +89,27 @@ class FeedItem(models.Model):
         fields.ArrayField(models.CharField(max_length=200), size=2),
         verbose_name='Related URLs Representation', size=30, null=True,
         blank=True)
+    create_date = models.DateTimeField(verbose_name="Creation Date",
+                                       auto_now_add=True)
+
+    class Meta:
+        db_table = 'entry'
+        ordering = ['-pub_date']
+        unique_together = [['source', 'guid']]
+        indexes = [
+            GinIndex(fields=['category'], name='entry_category_gin'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class FeedItem(models.Model):
+    entry = models.ForeignKey(Entry, on_delete=models.CASCADE,
+                              related_name="feed_items")
     feed = models.ForeignKey(Feed, on_delete=models.CASCADE,
                              related_name="items")
+    pub_date = models.DateTimeField(verbose_name='Pub. Date')
     create_date = models.DateTimeField(verbose_name="Creation Date",
                                        auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -85,10 +120,40 @@ class FeedItem(models.Model):
     class Meta:
         db_table = 'feed_item'
         ordering = ['-pub_date']
-        unique_together = [['guid', 'user']]
+        # Partitioned by month on create_date, see apps.feeds.partitions
+        indexes = [
+            models.Index(fields=['entry', 'user'],
+                         name='feed_item_entry_user_idx'),
+            # Keyset pagination of the feed item lists
+            models.Index(fields=['user', '-pub_date', '-id'],
+                         name='feed_item_user_pub_date_idx'),
+            models.Index(fields=['feed', '-pub_date', '-id'],
+                         name='feed_item_feed_pub_date_idx'),
+        ]
 
     def __str__(self):
-        return self.title
+        return str(self.entry)
+
+    @classmethod
+    def top_categories(cls, user, limit=50):
+        """
+        Returns categories of user's feed items by number of items
+
+        Categories are counted by the database, feed items are not loaded.
+
+        :param user: User
+        :param limit: Maximum number of categories
+        :return: List of (category, number of feed items)
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT c.name, count(*) AS qty '
+                f'FROM {cls._meta.db_table} AS i '
+                f'JOIN {Entry._meta.db_table} AS e ON e.id = i.entry_id '
+                f'CROSS JOIN unnest(e.category) AS c(name) '
+                f"WHERE i.user_id = %s AND c.name <> '' GROUP BY c.name "
+                f'ORDER BY qty DESC, c.name LIMIT %s', [user.pk, limit])
+            return cursor.fetchall()
 
     def mark_as_read(self):
         self.read = True
@@ -110,10 +175,11 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name="comments")
     feed_item = models.ForeignKey(FeedItem, on_delete=models.CASCADE,
-                                  related_name="comments")
+                                  related_name="comments",
+                                  db_constraint=False)
 
     class Meta:
         ordering = ['-date_created']
 
     def __str__(self):
-        return f'{self.author.username} - {self.feed_item.title}'
+        return f'{self.author.username} - {self.feed_item.entry.title}'
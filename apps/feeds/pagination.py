@@ -0,0 +1,104 @@
+import base64
+import binascii
+import datetime
+
+from django.db.models import Q
+
+
+def encode_token(feed_item) -> str:
+    """
+    Returns opaque token of a feed item position
+
+    :param feed_item: Feed item
+    :return: Url safe token
+    """
+    value = f'{feed_item.pub_date.isoformat()}|{feed_item.pk}'
+    return base64.urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_token(token) -> tuple:
+    """
+    Returns position encoded by encode_token
+
+    :param token: Token
+    :return: (Pub. date, Feed item ID)
+    :raise ValueError: Token is malformed
+    """
+    try:
+        value = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        pub_date, pk = value.decode().split('|')
+        return datetime.datetime.fromisoformat(pub_date), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f'Invalid page token {token}')
+
+
+class KeysetPage:
+    """
+    Page of feed items between two positions in (pub_date, id) order
+
+    Pages don't know their number nor the number of pages, so no page costs
+    more than the first one.
+    """
+
+    def __init__(self, object_list, has_previous, has_next):
+        self.object_list = object_list
+        self._has_previous = has_previous
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_previous(self) -> bool:
+        return self._has_previous and bool(self.object_list)
+
+    def has_next(self) -> bool:
+        return self._has_next and bool(self.object_list)
+
+    def has_other_pages(self) -> bool:
+        return self.has_previous() or self.has_next()
+
+    @property
+    def previous_token(self) -> str:
+        return encode_token(self.object_list[0])
+
+    @property
+    def next_token(self) -> str:
+        return encode_token(self.object_list[-1])
+
+
+def paginate_keyset(queryset, page_size, after=None,
+                    before=None) -> KeysetPage:
+    """
+    Returns page of feed items newest first
+
+    The page after a token holds older items, the page before it newer
+    ones. Items are looked up by an index range scan on (pub_date, id),
+    one extra row tells whether there is another page.
+
+    :param queryset: Feed items
+    :param page_size: Number of items per page
+    :param after: Token of the last item of the previous page
+    :param before: Token of the first item of the next page
+    :return: Page
+    :raise ValueError: Token is malformed
+    """
+    if before is not None:
+        pub_date, pk = decode_token(before)
+        rows = list(queryset.filter(pub_date__gte=pub_date).filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, id__gt=pk)
+        ).order_by('pub_date', 'id')[:page_size + 1])
+        if len(rows) > page_size:
+            return KeysetPage(rows[page_size - 1::-1], True, True)
+        # Reached the newest items, show a full first page
+        return paginate_keyset(queryset, page_size)
+    queryset = queryset.order_by('-pub_date', '-id')
+    if after is not None:
+        pub_date, pk = decode_token(after)
+        queryset = queryset.filter(pub_date__lte=pub_date).filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=pk))
+    rows = list(queryset[:page_size + 1])
+    return KeysetPage(rows[:page_size], after is not None,
+                      len(rows) > page_size)
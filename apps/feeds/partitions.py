@@ -0,0 +1,169 @@
+import re
+import datetime
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.feeds.models import Comment, Entry, Feed, FeedItem
+
+ITEM_TABLE = FeedItem._meta.db_table
+
+# Default partition, receives rows of months without a partition
+KEEP_PARTITION = f'{ITEM_TABLE}_keep'
+
+PARTITION_NAME = re.compile(rf'^{ITEM_TABLE}_y(\d{{4}})m(\d{{2}})$')
+
+
+def month_start(date) -> datetime.datetime:
+    """
+    Returns start of the month of date in UTC
+
+    :param date: Aware datetime
+    :return: First moment of the month
+    """
+    date = date.astimezone(datetime.timezone.utc)
+    return date.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month, months) -> datetime.datetime:
+    """
+    Moves start of a month by number of months
+
+    :param month: First moment of a month
+    :param months: Number of months, negative moves back
+    :return: First moment of the month
+    """
+    year, idx = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return month.replace(year=year, month=idx + 1)
+
+
+def partition_name(month) -> str:
+    return f'{ITEM_TABLE}_y{month.year}m{month.month:02d}'
+
+
+def get_partitions(cursor) -> dict:
+    """
+    Returns monthly partitions of feed_item
+
+    :param cursor: DB cursor
+    :return: Dict of partition name: first moment of its month
+    """
+    cursor.execute(
+        'SELECT c.relname FROM pg_inherits AS i '
+        'JOIN pg_class AS c ON c.oid = i.inhrelid '
+        'JOIN pg_class AS p ON p.oid = i.inhparent WHERE p.relname = %s',
+        [ITEM_TABLE])
+    partitions = dict()
+    for name, in cursor.fetchall():
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions[name] = datetime.datetime(
+                int(match.group(1)), int(match.group(2)), 1,
+                tzinfo=datetime.timezone.utc)
+    return partitions
+
+
+def create_partition(cursor, month):
+    """
+    Creates partition of a month
+
+    Rows of the month which ended up in the default partition are moved to
+    the new partition before it's attached.
+
+    :param cursor: DB cursor
+    :param month: First moment of the month
+    :return: None
+    """
+    name = partition_name(month)
+    bounds = (f"FROM ('{month.isoformat()}') "
+              f"TO ('{add_months(month, 1).isoformat()}')")
+    cursor.execute(f'CREATE TABLE {name} (LIKE {ITEM_TABLE} '
+                   f'INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+    cursor.execute(
+        f'WITH moved AS (DELETE FROM {KEEP_PARTITION} '
+        f'WHERE create_date >= %s AND create_date < %s RETURNING *) '
+        f'INSERT INTO {name} SELECT * FROM moved',
+        [month, add_months(month, 1)])
+    cursor.execute(f'ALTER TABLE {ITEM_TABLE} ATTACH PARTITION {name} '
+                   f'FOR VALUES {bounds}')
+
+
+def drop_partition(cursor, name) -> int:
+    """
+    Detaches and drops partition, keeping favorited and commented items
+
+    Kept rows are inserted back into feed_item, there is no partition for
+    their month anymore, so they are stored in the default partition.
+
+    :param cursor: DB cursor
+    :param name: Partition name
+    :return: Number of kept feed items
+    """
+    cursor.execute(f'ALTER TABLE {ITEM_TABLE} DETACH PARTITION {name}')
+    cursor.execute(
+        f'INSERT INTO {ITEM_TABLE} SELECT * FROM {name} AS i '
+        f'WHERE i.favorite OR EXISTS (SELECT 1 FROM {Comment._meta.db_table} '
+        f'AS c WHERE c.feed_item_id = i.id)')
+    kept = cursor.rowcount
+    cursor.execute(f'DROP TABLE {name}')
+    return kept
+
+
+def create_partitions(ahead, now=None) -> list:
+    """
+    Creates missing partitions from the current month on
+
+    :param ahead: Number of months after the current one
+    :param now: Current time
+    :return: Names of created partitions
+    """
+    current = month_start(now or timezone.now())
+    created = list()
+    with transaction.atomic(), connection.cursor() as cursor:
+        existing = get_partitions(cursor)
+        for idx in range(ahead + 1):
+            month = add_months(current, idx)
+            if partition_name(month) not in existing:
+                create_partition(cursor, month)
+                created.append(partition_name(month))
+    return created
+
+
+def apply_retention(retention, now=None) -> dict:
+    """
+    Drops partitions of months older than retention
+
+    Every partition is dropped in its own transaction. Rows of the default
+    partition which aren't favorited nor commented anymore are deleted once
+    they are older than retention too. Entries outlive their feed items,
+    they keep items still in the document of a source from being stored
+    again as new ones, so they are deleted once nobody subscribes to their
+    source anymore.
+
+    :param retention: Number of months before the current one to keep
+    :param now: Current time
+    :return: Dict of dropped partitions, kept, deleted and entries counts
+    """
+    cutoff = add_months(month_start(now or timezone.now()), -retention)
+    result = {'dropped': list(), 'kept': 0}
+    with connection.cursor() as cursor:
+        for name, month in sorted(get_partitions(cursor).items()):
+            if month < cutoff:
+                with transaction.atomic():
+                    result['kept'] += drop_partition(cursor, name)
+                result['dropped'].append(name)
+        with transaction.atomic():
+            cursor.execute(
+                f'DELETE FROM {KEEP_PARTITION} AS i '
+                f'WHERE i.create_date < %s AND NOT i.favorite '
+                f'AND NOT EXISTS (SELECT 1 FROM {Comment._meta.db_table} '
+                f'AS c WHERE c.feed_item_id = i.id)', [cutoff])
+            result['deleted'] = cursor.rowcount
+            cursor.execute(
+                f'DELETE FROM {Entry._meta.db_table} AS e '
+                f'WHERE e.create_date < %s AND NOT EXISTS ('
+                f'SELECT 1 FROM {ITEM_TABLE} AS i WHERE i.entry_id = e.id) '
+                f'AND NOT EXISTS (SELECT 1 FROM {Feed._meta.db_table} AS f '
+                f'WHERE f.link = e.source)', [cutoff])
+            result['entries'] = cursor.rowcount
+    return result
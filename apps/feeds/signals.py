@@ -1,8 +1,27 @@
-from django.db.models.signals import post_delete
+from django.conf import settings
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from apps.feeds.models import Feed
 
-@receiver(post_delete)
-def delete_usubscribed_feed(sender, instance, using):
-    if not instance.feed.subscriptions.count():
-        instance.feed.delete()
+
+def notify_fetcher(feed_id):
+    """
+    Notifies feed fetchers that feed schedule has changed
+
+    Notifications are delivered by PostgreSQL when the current transaction
+    commits.
+
+    :param feed_id: Feed ID
+    :return: None
+    """
+    with connection.cursor() as cur:
+        cur.execute('SELECT pg_notify(%s, %s)',
+                    [settings.FEED_NOTIFY_CHANNEL, str(feed_id)])
+
+
+@receiver(post_save, sender=Feed)
+@receiver(post_delete, sender=Feed)
+def feed_changed(sender, instance, **kwargs):
+    notify_fetcher(instance.pk)
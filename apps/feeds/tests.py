@@ -1,17 +1,41 @@
 import uuid
+import datetime
+from unittest import mock
+from urllib.parse import quote
 
+from django.db import connection
 from django.db.utils import IntegrityError
 from django.test import TestCase, Client
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils import timezone
 
-from apps.feeds.models import Feed, FeedItem, Comment
+from apps.feeds.models import Feed, Entry, FeedItem, Comment
+from apps.feeds.views import FeedItemListView
+from apps.feeds.partitions import add_months, apply_retention, \
+    create_partition, create_partitions, month_start, partition_name
 from apps.feeds.forms import (
     CreateFeedForm, UpdateFeedForm, UpdateCommentForm, CommentCreationForm
 )
 
 
+def create_feed_item(feed, user, favorite=False, read=False, **kwargs):
+    """
+    Creates entry of the feed and delivers it to the user
+
+    :param feed: Feed
+    :param user: User
+    :param favorite: Favorite flag of the user
+    :param read: Read flag of the user
+    :param kwargs: Entry fields
+    :return: Feed item
+    """
+    entry = Entry.objects.create(source=feed.link, **kwargs)
+    return FeedItem.objects.create(entry=entry, feed=feed, user=user,
+                                   pub_date=entry.pub_date,
+                                   favorite=favorite, read=read)
+
+
 class FeedTests(TestCase):
     def setUp(self):
         self.test_user = User.objects.create_user(
@@ -38,6 +62,17 @@ class FeedTests(TestCase):
         self.assertNotEqual(scan_after, self.feed.scan_after)
         self.assertLess(scan_after, self.feed.scan_after)
 
+    @mock.patch('apps.feeds.signals.notify_fetcher')
+    def test_pull_now_notifies_fetcher(self, mock_notify):
+        self.feed.pull_now()
+        mock_notify.assert_called_once_with(self.feed.pk)
+
+    @mock.patch('apps.feeds.signals.notify_fetcher')
+    def test_delete_notifies_fetcher(self, mock_notify):
+        feed_id = self.feed.pk
+        self.feed.delete()
+        mock_notify.assert_called_once_with(feed_id)
+
 
 class FeedItemCreationTests(TestCase):
     def setUp(self):
@@ -49,7 +84,7 @@ class FeedItemCreationTests(TestCase):
             ttl=60,
             user=self.test_user
         )
-        self.feed_item = FeedItem.objects.create(
+        self.feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             guid=uuid.uuid4(),
@@ -60,7 +95,7 @@ class FeedItemCreationTests(TestCase):
         )
 
     def test_none_creator_is_represented_as_empty_string(self):
-        feed_item = FeedItem(
+        feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             creator=None,
@@ -70,13 +105,12 @@ class FeedItemCreationTests(TestCase):
             category=['Category 1'],
             pub_date=timezone.now()
         )
-        feed_item.save()
-        feed_item.refresh_from_db()
-        self.assertEqual(feed_item.creator, None)
+        feed_item.entry.refresh_from_db()
+        self.assertEqual(feed_item.entry.creator, None)
 
     def test_allow_two_feed_items_without_author(self):
         for x in range(2):
-            FeedItem.objects.create(
+            create_feed_item(
                 title=f'Feed Item Title {x}',
                 description=f'Feed Item Description {x}',
                 guid=uuid.uuid4(),
@@ -88,7 +122,7 @@ class FeedItemCreationTests(TestCase):
             )
 
     def test_feed_item_mark_as_read(self):
-        feed_item = FeedItem(
+        feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             guid=uuid.uuid4(),
@@ -102,7 +136,7 @@ class FeedItemCreationTests(TestCase):
         self.assertTrue(feed_item.read)
 
     def test_feed_item_mark_as_unread(self):
-        feed_item = FeedItem(
+        feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             guid=uuid.uuid4(),
@@ -116,7 +150,7 @@ class FeedItemCreationTests(TestCase):
         self.assertFalse(feed_item.read)
 
     def test_feed_item_mark_as_favourite(self):
-        feed_item = FeedItem(
+        feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             guid=uuid.uuid4(),
@@ -129,6 +163,20 @@ class FeedItemCreationTests(TestCase):
         feed_item.refresh_from_db()
         self.assertTrue(feed_item.favorite)
 
+    def test_entry_is_shared_by_subscribers(self):
+        other_user = User.objects.create_user(
+            username='testuser2', password='qwerty2019'
+        )
+        other_feed = Feed.objects.create(link=self.feed.link, ttl=60,
+                                         user=other_user)
+        other_item = FeedItem.objects.create(
+            entry=self.feed_item.entry, feed=other_feed, user=other_user,
+            pub_date=self.feed_item.pub_date)
+        other_item.toggle_favorite()
+        self.feed_item.refresh_from_db()
+        self.assertFalse(self.feed_item.favorite)
+        self.assertEqual(self.feed_item.entry.feed_items.count(), 2)
+
     def test_feed_item_inherit_fields(self):
         self.assertEqual(
             'http://www.nu.nl/rss/Algemeen', self.feed_item.feed.link
@@ -137,6 +185,91 @@ class FeedItemCreationTests(TestCase):
         self.assertEqual(False, self.feed_item.feed.terminated)
 
 
+class PartitionTests(TestCase):
+    def setUp(self):
+        self.test_user = User.objects.create_user(
+            username='testuser1', password='qwerty2019'
+        )
+        self.feed = Feed.objects.create(
+            link='http://www.nu.nl/rss/Algemeen',
+            ttl=60,
+            user=self.test_user
+        )
+        self.month = month_start(timezone.now())
+        self.expired = add_months(self.month, -14)
+
+    def create_expired_items(self, count):
+        with connection.cursor() as cursor:
+            create_partition(cursor, self.expired)
+        items = [
+            create_feed_item(
+                title=f'Feed Item {idx}',
+                guid=uuid.uuid4(),
+                feed=self.feed,
+                user=self.test_user,
+                category=['Category 1'],
+                pub_date=self.expired
+            )
+            for idx in range(count)
+        ]
+        pks = [item.pk for item in items]
+        FeedItem.objects.filter(pk__in=pks).update(
+            create_date=self.expired + datetime.timedelta(days=1))
+        Entry.objects.filter(feed_items__pk__in=pks).update(
+            create_date=self.expired)
+        return list(FeedItem.objects.filter(pk__in=pks).order_by('pk'))
+
+    def apply_retention(self, retention):
+        # TestCase runs in a transaction, foreign key checks of the rows
+        # inserted by the test would still be pending when a partition is
+        # dropped, which Postgres refuses
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        return apply_retention(retention, now=self.month)
+
+    def test_future_partitions_are_created(self):
+        self.assertEqual(
+            create_partitions(4, now=self.month),
+            [partition_name(add_months(self.month, 3)),
+             partition_name(add_months(self.month, 4))])
+        self.assertEqual(create_partitions(4, now=self.month), [])
+
+    def test_expired_partition_is_dropped(self):
+        items = self.create_expired_items(3)
+        items[0].toggle_favorite()
+        Comment.objects.create(text='Comment', author=self.test_user,
+                               feed_item=items[1])
+        result = self.apply_retention(12)
+        self.assertEqual(result['dropped'], [partition_name(self.expired)])
+        self.assertEqual(result['kept'], 2)
+        self.assertEqual(result['entries'], 0)
+        self.assertEqual(Entry.objects.count(), 3)
+        self.assertEqual(
+            set(FeedItem.objects.values_list('pk', flat=True)),
+            {items[0].pk, items[1].pk})
+        self.assertEqual(items[1].comments.count(), 1)
+
+    def test_kept_items_are_deleted_when_not_favorite(self):
+        items = self.create_expired_items(1)
+        items[0].toggle_favorite()
+        self.apply_retention(12)
+        items[0].toggle_favorite()
+        result = self.apply_retention(12)
+        self.assertEqual(result['dropped'], [])
+        self.assertEqual(result['deleted'], 1)
+        self.assertEqual(result['entries'], 0)
+        self.assertFalse(FeedItem.objects.exists())
+
+    def test_entries_are_deleted_when_source_is_unsubscribed(self):
+        self.create_expired_items(2)
+        self.apply_retention(12)
+        self.assertEqual(Entry.objects.count(), 2)
+        self.feed.delete()
+        result = self.apply_retention(12)
+        self.assertEqual(result['entries'], 2)
+        self.assertFalse(Entry.objects.exists())
+
+
 class CommentCreationTests(TestCase):
     def setUp(self):
         self.test_user = User.objects.create_user(
@@ -147,7 +280,7 @@ class CommentCreationTests(TestCase):
             ttl=60,
             user=self.test_user
         )
-        self.feed_item = FeedItem.objects.create(
+        self.feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             guid=uuid.uuid4(),
@@ -226,7 +359,7 @@ class CommentCreationFormTests(TestCase):
             ttl=60,
             user=self.test_user
         )
-        self.feed_item = FeedItem.objects.create(
+        self.feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             guid=uuid.uuid4(),
@@ -269,7 +402,7 @@ class UpdateCommentFormTests(TestCase):
             ttl=60,
             user=self.test_user
         )
-        self.feed_item = FeedItem.objects.create(
+        self.feed_item = create_feed_item(
             title='Feed Item Title',
             description='Feed Item Description',
             guid=uuid.uuid4(),
@@ -322,7 +455,7 @@ class FeedsTestCase(TestCase):
                 user=user
             )
             for y in range(10):
-                feed_item = FeedItem.objects.create(
+                feed_item = create_feed_item(
                     title=f'Feed Item {y}',
                     description='Feed Item Description',
                     guid=uuid.uuid4(),
@@ -545,6 +678,40 @@ class FeedItemViewTests(FeedsTestCase):
             for feed_item in resp.context['feed_items']
         ]))
 
+    def test_list_is_paginated_by_position(self):
+        login = self.client.login(username=self.user.username,
+                                  password='qwerty2019')
+        self.assertTrue(login)
+        url = reverse('feeds:feed_item_list')
+        with mock.patch.object(FeedItemListView, 'paginate_by', 7):
+            resp = self.client.get(url)
+            pages = [list(resp.context['feed_items'])]
+            while resp.context['page_obj'].has_next():
+                resp = self.client.get(
+                    url, {'after': resp.context['page_obj'].next_token})
+                pages.append(list(resp.context['feed_items']))
+            self.assertEqual([len(page) for page in pages], [7, 7, 6])
+            self.assertIsNone(resp.context['paginator'])
+            resp = self.client.get(
+                url, {'before': resp.context['page_obj'].previous_token})
+            self.assertEqual(list(resp.context['feed_items']), pages[1])
+            resp = self.client.get(
+                url, {'before': resp.context['page_obj'].previous_token})
+            self.assertEqual(list(resp.context['feed_items']), pages[0])
+            self.assertFalse(resp.context['page_obj'].has_previous())
+        self.assertEqual(
+            [feed_item for page in pages for feed_item in page],
+            list(FeedItem.objects.filter(user=self.user).order_by(
+                '-pub_date', '-id')))
+
+    def test_list_invalid_page_token_not_found(self):
+        login = self.client.login(username=self.user.username,
+                                  password='qwerty2019')
+        self.assertTrue(login)
+        url = reverse('feeds:feed_item_list')
+        resp = self.client.get(url, {'after': 'abc'})
+        self.assertEqual(resp.status_code, 404)
+
     def test_list_unread_ok(self):
         login = self.client.login(username=self.user.username,
                                   password='qwerty2019')
@@ -619,6 +786,75 @@ class FeedItemViewTests(FeedsTestCase):
         ]))
 
 
+class CategoryViewTests(FeedsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.feed = Feed.objects.filter(user=self.user).first()
+        create_feed_item(
+            title='Categorized Feed Item',
+            description='Feed Item Description',
+            guid=uuid.uuid4(),
+            feed=self.feed,
+            user=self.user,
+            category=['Category 1', 'Category 2'],
+            pub_date=timezone.now()
+        )
+
+    def test_category_list_unauth_redirect_ok(self):
+        url = reverse('feeds:category_list')
+        resp = self.client.get(url)
+        self.assertRedirects(resp, f'/users/login/?next={url}')
+
+    def test_category_items_unauth_redirect_ok(self):
+        url = reverse('feeds:category_feed_items',
+                      kwargs={'category': 'Category 2'})
+        resp = self.client.get(url)
+        # Login redirect quotes the already quoted path again
+        self.assertRedirects(resp, f'/users/login/?next={quote(url)}')
+
+    def test_top_categories(self):
+        self.assertEqual(FeedItem.top_categories(self.user),
+                         [('Category 1', 21), ('Category 2', 1)])
+        self.assertEqual(FeedItem.top_categories(self.user, limit=1),
+                         [('Category 1', 21)])
+
+    def test_category_list_ok(self):
+        login = self.client.login(username=self.user.username,
+                                  password='qwerty2019')
+        self.assertTrue(login)
+        resp = self.client.get(reverse('feeds:category_list'))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['current_page'], 'feeds')
+        self.assertEqual(resp.context['categories'][0], ('Category 1', 21))
+
+    def test_category_items_ok(self):
+        login = self.client.login(username=self.user.username,
+                                  password='qwerty2019')
+        self.assertTrue(login)
+        url = reverse('feeds:category_feed_items',
+                      kwargs={'category': 'Category 2'})
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['category'], 'Category 2')
+        self.assertEqual([feed_item.entry.title
+                          for feed_item in resp.context['feed_items']],
+                         ['Categorized Feed Item'])
+
+    def test_feed_category_items_ok(self):
+        login = self.client.login(username=self.user.username,
+                                  password='qwerty2019')
+        self.assertTrue(login)
+        url = reverse('feeds:feed_category_feed_items',
+                      kwargs={'pk': self.feed.pk, 'category': 'Category 1'})
+        resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context['feed_items']), 11)
+        self.assertFalse(any([
+            feed_item.user != self.user or feed_item.feed_id != self.feed.pk
+            for feed_item in resp.context['feed_items']
+        ]))
+
+
 class FeedItemDetailViewTests(FeedsTestCase):
     def test_item_detail_unauth_redirect_ok(self):
         feed = Feed.objects.first()
@@ -6,7 +6,8 @@ from apps.feeds.views import FeedListView, CreateFeedFormView, \
     FeedFeedItemListView, FeedItemDetailView, FeedItemListView, \
     FeedItemUnreadListView, FeedItemFavListView, ToggleFavoriteFeedItemView, \
     FeedItemMarkUnreadView, CommentCreateView, CommentUpdateView, \
-    CommentDeleteView
+    CommentDeleteView, CategoryListView, CategoryFeedItemListView, \
+    FeedCategoryFeedItemListView
 
 app_name = 'feeds'
 urlpatterns = [
@@ -35,6 +36,13 @@ urlpatterns = [
          FeedItemUnreadListView.as_view(), name='feed_items_unread'),
     path('items/favorite/',
          FeedItemFavListView.as_view(), name='feed_items_fav'),
+    path('categories/',
+         CategoryListView.as_view(), name='category_list'),
+    path('items/category/<path:category>/',
+         CategoryFeedItemListView.as_view(), name='category_feed_items'),
+    path('<int:pk>/items/category/<path:category>/',
+         FeedCategoryFeedItemListView.as_view(),
+         name='feed_category_feed_items'),
     path('<int:fid>/items/<int:iid>/comments/create/',
          CommentCreateView.as_view(), name='comment_create'),
     path('<int:fid>/items/<int:iid>/comments/<int:pk>/edit/',
@@ -7,7 +7,7 @@ from django.views import generic
 
 from apps.feeds.forms import CreateFeedForm, UpdateFeedForm, \
     UpdateCommentForm, CommentCreationForm
-from apps.feeds.mixins import AuthRequiredMixin
+from apps.feeds.mixins import AuthRequiredMixin, KeysetPaginationMixin
 from apps.feeds.models import Feed, FeedItem, Comment
 
 
@@ -18,7 +18,8 @@ class DashboardView(AuthRequiredMixin, generic.TemplateView):
         ctx = super().get_context_data(**kwargs)
         ctx['current_page'] = 'dashboard'
         ctx['fav_feed_items'] = FeedItem.objects.filter(
-            favorite=True, user=self.request.user)[:20]
+            favorite=True,
+            user=self.request.user).select_related('entry')[:20]
         return ctx
 
 
@@ -109,7 +110,8 @@ class FeedItemDetailView(AuthRequiredMixin, generic.DetailView):
     context_object_name = "feed_item"
 
     def get_queryset(self):
-        return FeedItem.objects.filter(user=self.request.user)
+        return FeedItem.objects.filter(
+            user=self.request.user).select_related('entry')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -157,7 +159,8 @@ class FeedItemDetailView(AuthRequiredMixin, generic.DetailView):
             })
 
 
-class FeedFavFeedItemListView(AuthRequiredMixin, generic.ListView):
+class FeedFavFeedItemListView(AuthRequiredMixin, KeysetPaginationMixin,
+                              generic.ListView):
     model = FeedItem
     template_name = 'feeds/feed_item_list.html'
     paginate_by = 20
@@ -168,7 +171,8 @@ class FeedFavFeedItemListView(AuthRequiredMixin, generic.ListView):
         if not pk:
             return FeedItem.objects.none()
         return FeedItem.objects.filter(
-            feed_id=pk, user=self.request.user, favorite=True)
+            feed_id=pk, user=self.request.user,
+            favorite=True).select_related('entry')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -176,7 +180,8 @@ class FeedFavFeedItemListView(AuthRequiredMixin, generic.ListView):
         return ctx
 
 
-class FeedUnreadFeedItemListView(AuthRequiredMixin, generic.ListView):
+class FeedUnreadFeedItemListView(AuthRequiredMixin, KeysetPaginationMixin,
+                                 generic.ListView):
     model = FeedItem
     template_name = 'feeds/feed_item_list.html'
     paginate_by = 20
@@ -187,7 +192,8 @@ class FeedUnreadFeedItemListView(AuthRequiredMixin, generic.ListView):
         if not pk:
             return FeedItem.objects.none()
         return FeedItem.objects.filter(
-            feed_id=pk, user=self.request.user, read=False)
+            feed_id=pk, user=self.request.user,
+            read=False).select_related('entry')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -195,7 +201,8 @@ class FeedUnreadFeedItemListView(AuthRequiredMixin, generic.ListView):
         return ctx
 
 
-class FeedFeedItemListView(AuthRequiredMixin, generic.ListView):
+class FeedFeedItemListView(AuthRequiredMixin, KeysetPaginationMixin,
+                           generic.ListView):
     model = FeedItem
     template_name = 'feeds/feed_item_list.html'
     paginate_by = 20
@@ -205,7 +212,8 @@ class FeedFeedItemListView(AuthRequiredMixin, generic.ListView):
         pk = self.kwargs.get('pk', None)
         if not pk:
             return FeedItem.objects.none()
-        return FeedItem.objects.filter(user=self.request.user, feed_id=pk)
+        return FeedItem.objects.filter(
+            user=self.request.user, feed_id=pk).select_related('entry')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -213,14 +221,16 @@ class FeedFeedItemListView(AuthRequiredMixin, generic.ListView):
         return ctx
 
 
-class FeedItemListView(AuthRequiredMixin, generic.ListView):
+class FeedItemListView(AuthRequiredMixin, KeysetPaginationMixin,
+                       generic.ListView):
     model = FeedItem
     template_name = 'feeds/feed_item_list.html'
     paginate_by = 20
     context_object_name = 'feed_items'
 
     def get_queryset(self):
-        return FeedItem.objects.filter(user=self.request.user)
+        return FeedItem.objects.filter(
+            user=self.request.user).select_related('entry')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -228,14 +238,16 @@ class FeedItemListView(AuthRequiredMixin, generic.ListView):
         return ctx
 
 
-class FeedItemUnreadListView(AuthRequiredMixin, generic.ListView):
+class FeedItemUnreadListView(AuthRequiredMixin, KeysetPaginationMixin,
+                             generic.ListView):
     model = FeedItem
     template_name = 'feeds/feed_item_list.html'
     paginate_by = 20
     context_object_name = 'feed_items'
 
     def get_queryset(self):
-        return FeedItem.objects.filter(user=self.request.user, read=False)
+        return FeedItem.objects.filter(
+            user=self.request.user, read=False).select_related('entry')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
@@ -243,18 +255,73 @@ class FeedItemUnreadListView(AuthRequiredMixin, generic.ListView):
         return ctx
 
 
-class FeedItemFavListView(AuthRequiredMixin, generic.ListView):
+class FeedItemFavListView(AuthRequiredMixin, KeysetPaginationMixin,
+                          generic.ListView):
     model = FeedItem
     template_name = 'feeds/feed_item_list.html'
     paginate_by = 20
     context_object_name = 'feed_items'
 
     def get_queryset(self):
-        return FeedItem.objects.filter(user=self.request.user, favorite=True)
+        return FeedItem.objects.filter(
+            user=self.request.user, favorite=True).select_related('entry')
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['current_page'] = 'feeds'
+        return ctx
+
+
+class CategoryListView(AuthRequiredMixin, generic.TemplateView):
+    template_name = 'feeds/category_list.html'
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['current_page'] = 'feeds'
+        ctx['categories'] = FeedItem.top_categories(self.request.user)
+        return ctx
+
+
+class CategoryFeedItemListView(AuthRequiredMixin, KeysetPaginationMixin,
+                               generic.ListView):
+    model = FeedItem
+    template_name = 'feeds/feed_item_list.html'
+    paginate_by = 20
+    context_object_name = 'feed_items'
+
+    def get_queryset(self):
+        return FeedItem.objects.filter(
+            user=self.request.user,
+            entry__category__contains=[self.kwargs.get('category')]
+        ).select_related('entry')
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        ctx['current_page'] = 'feeds'
+        ctx['category'] = self.kwargs.get('category')
+        return ctx
+
+
+class FeedCategoryFeedItemListView(AuthRequiredMixin, KeysetPaginationMixin,
+                                   generic.ListView):
+    model = FeedItem
+    template_name = 'feeds/feed_item_list.html'
+    paginate_by = 20
+    context_object_name = 'feed_items'
+
+    def get_queryset(self):
+        pk = self.kwargs.get('pk', None)
+        if not pk:
+            return FeedItem.objects.none()
+        return FeedItem.objects.filter(
+            feed_id=pk, user=self.request.user,
+            entry__category__contains=[self.kwargs.get('category')]
+        ).select_related('entry')
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
         ctx['current_page'] = 'feeds'
+        ctx['category'] = self.kwargs.get('category')
         return ctx
 
 
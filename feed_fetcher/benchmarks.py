@@ -0,0 +1,311 @@
+import os
+import re
+import sys
+import time
+import timeit
+import datetime
+import platform
+import tracemalloc
+
+from feed_fetcher.helpers import parse_date, parse_feed, \
+    get_available_engines
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'tests', 'data')
+
+# Formats the fetcher used to parse dates of the fixtures with
+STRPTIME_FORMATS = ('%a, %d %b %Y %H:%M:%S %z', '%a, %d %b %Y %H:%M:%S %Z')
+
+DATE_TAGS_RE = re.compile(r'<(pubDate|lastBuildDate)>([^<]+)</\1>')
+
+
+def read_fixture_dates() -> list:
+    """
+    Collects date strings of the test fixtures
+
+    :return: List of date strings
+    """
+    dates = list()
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        with open(os.path.join(FIXTURES_DIR, name), 'r') as f:
+            dates.extend(value.strip()
+                         for _, value in DATE_TAGS_RE.findall(f.read()))
+    return dates
+
+
+def strptime_date(value):
+    """
+    Parses date by trying the formats with strptime
+
+    :param value: Date string
+    :return: Datetime or None
+    """
+    for date_format in STRPTIME_FORMATS:
+        try:
+            return datetime.datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    return None
+
+
+def benchmark_dates(number=10000) -> dict:
+    """
+    Times parse_date against strptime on the fixture dates
+
+    :param number: Passes over the fixture dates
+    :return: Mapping of parser name to microseconds per date
+    """
+    dates = read_fixture_dates()
+    res = dict()
+    for name, func in (('parse_date', parse_date),
+                       ('strptime', strptime_date)):
+        seconds = timeit.timeit(lambda: [func(value) for value in dates],
+                                number=number)
+        res[name] = seconds * 1000000 / (number * len(dates))
+    return res
+
+
+DOCUMENT_FORMATS = ('rss', 'atom', 'feedburner')
+
+WORDS = ('feed', 'reader', 'async', 'worker', 'parser', 'nieuws', 'update',
+         'release', 'benchmark', 'category', 'document', 'memory')
+
+
+def lorem(size, seed) -> str:
+    """
+    Returns text of about the given size
+
+    :param size: Characters
+    :param seed: Varies the text between items
+    :return: Text
+    """
+    words = list()
+    length = 0
+    idx = seed
+    while length < size:
+        word = WORDS[idx % len(WORDS)]
+        words.append(word)
+        length += len(word) + 1
+        idx = idx * 7 + 3
+    return ' '.join(words)
+
+
+def rss_item(idx, description_size) -> str:
+    return (
+        f'<item><title>Item {idx} {lorem(60, idx)}</title>'
+        f'<link>https://example.org/items/{idx}.html</link>'
+        f'<description>{lorem(description_size, idx)}</description>'
+        f'<category>Category {idx % 10}</category>'
+        f'<category>Category {idx % 7}</category>'
+        f'<guid isPermaLink="false">https://example.org/{idx}</guid>'
+        f'<pubDate>Sat, 28 Dec 2019 {idx % 24:02d}:{idx % 60:02d}:00 '
+        f'+0100</pubDate>'
+        f'<dc:creator>Author {idx % 13}</dc:creator>'
+        f'<dc:rights>Copyright Example</dc:rights>'
+        f'<media:content url="https://example.org/img/{idx}.jpg" '
+        f'medium="image"/>'
+        f'<atom:link rel="related" href="https://example.org/rel/{idx}" '
+        f'title="Related {idx}"/>'
+        f'</item>')
+
+
+def feedburner_item(idx, description_size) -> str:
+    return (
+        f'<item><title>Item {idx} {lorem(60, idx)}</title>'
+        f'<link>https://example.org/items/{idx}.html</link>'
+        f'<description>{lorem(description_size, idx)}&lt;img '
+        f'src="http://feeds.feedburner.com/~r/example/~4/{idx}" '
+        f'height="1" width="1" alt=""/&gt;</description>'
+        f'<author>Author {idx % 13}</author>'
+        f'<category>Nieuws - : Section {idx % 5} / Topic {idx % 9}'
+        f'</category>'
+        f'<comments>https://example.org/items/{idx}.html#comments</comments>'
+        f'<guid isPermaLink="false">https://example.org/{idx}</guid>'
+        f'<pubDate>Sat, 28 Dec 2019 {idx % 24:02d}:{idx % 60:02d}:00 GMT'
+        f'</pubDate>'
+        f'<feedburner:origLink>https://example.org/items/{idx}.html'
+        f'</feedburner:origLink>'
+        f'</item>')
+
+
+def atom_entry(idx, description_size) -> str:
+    return (
+        f'<entry><title>Entry {idx} {lorem(60, idx)}</title>'
+        f'<link href="https://example.org/entries/{idx}.html"/>'
+        f'<link rel="related" href="https://example.org/rel/{idx}" '
+        f'title="Related {idx}"/>'
+        f'<id>urn:example:{idx}</id>'
+        f'<published>2019-12-28T{idx % 24:02d}:{idx % 60:02d}:00+01:00'
+        f'</published>'
+        f'<updated>2019-12-28T{idx % 24:02d}:{idx % 60:02d}:30Z</updated>'
+        f'<summary>{lorem(description_size, idx)}</summary>'
+        f'<author><name>Author {idx % 13}</name></author>'
+        f'<category term="Category {idx % 10}"/>'
+        f'<media:thumbnail url="https://example.org/img/{idx}.jpg"/>'
+        f'</entry>')
+
+
+def generate_document(document_format, items, description_size=2000) -> str:
+    """
+    Generates feed document of the given format
+
+    :param document_format: rss, atom or feedburner
+    :param items: Number of items
+    :param description_size: Characters of every item description
+    :return: Document
+    """
+    if document_format == 'atom':
+        head = ('<?xml version="1.0" encoding="utf-8"?>'
+                '<feed xmlns="http://www.w3.org/2005/Atom" '
+                'xmlns:media="http://search.yahoo.com/mrss/">'
+                '<title>Benchmark Atom Feed</title>'
+                '<subtitle>Generated feed</subtitle>'
+                '<link href="https://example.org/"/>'
+                '<updated>2019-12-28T13:44:53Z</updated>')
+        body = ''.join(atom_entry(idx, description_size)
+                       for idx in range(items))
+        return f'{head}{body}</feed>'
+    if document_format == 'feedburner':
+        head = ('<?xml version="1.0" encoding="UTF-8"?>'
+                '<rss xmlns:feedburner='
+                '"http://rssnamespace.org/feedburner/ext/1.0" '
+                'xmlns:atom10="http://www.w3.org/2005/Atom" version="2.0">'
+                '<channel><title>Benchmark Feedburner Feed</title>'
+                '<link>https://example.org/</link>'
+                '<description>Generated feed</description>'
+                '<language>nl-nl</language>'
+                '<lastBuildDate>Sat, 28 Dec 2019 12:52:00 GMT</lastBuildDate>'
+                '<atom10:link rel="self" href="http://feeds.feedburner.com/'
+                'example"/><feedburner:info uri="example"/>')
+        body = ''.join(feedburner_item(idx, description_size)
+                       for idx in range(items))
+        return f'{head}{body}</channel></rss>'
+    head = ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<rss xmlns:dc="http://purl.org/dc/elements/1.1/" '
+            'xmlns:media="http://search.yahoo.com/mrss/" '
+            'xmlns:atom="http://www.w3.org/2005/Atom" version="2.0">'
+            '<channel><title>Benchmark RSS Feed</title>'
+            '<link>https://example.org/</link>'
+            '<description>Generated feed</description>'
+            '<language>en</language><ttl>60</ttl>'
+            '<lastBuildDate>Sat, 28 Dec 2019 13:44:53 +0100</lastBuildDate>'
+            '<image><url>https://example.org/logo.png</url></image>')
+    body = ''.join(rss_item(idx, description_size) for idx in range(items))
+    return f'{head}{body}</channel></rss>'
+
+
+# Recorded documents of the test fixtures: file name, format and feed host
+FIXTURE_DOCUMENTS = (
+    ('algemeen.xml', 'rss', 'www.nu.nl'),
+    ('feedburner_tweakers_mixed.xml', 'feedburner', 'feeds.feedburner.com'),
+)
+
+
+def read_fixture_document(name) -> bytes:
+    """
+    Reads recorded document of the test fixtures
+
+    :param name: File name
+    :return: Document as received
+    """
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def benchmark_document(document, service_name, engine, repeat=3) -> dict:
+    """
+    Measures parsing of a document
+
+    Throughput is taken from the fastest run. Allocations are the memory
+    blocks allocated by a parse and still held by its result, peak memory
+    is traced in a separate run.
+
+    :param document: Feed document, str or bytes
+    :param service_name: Feed host
+    :param engine: Parser engine name
+    :param repeat: Timed runs
+    :return: Measurements
+    """
+    body = document if isinstance(document, bytes) else document.encode()
+    seconds = None
+    items = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        items = len(parse_feed(body, service_name, engine).items)
+        elapsed = time.perf_counter() - started
+        seconds = elapsed if seconds is None else min(seconds, elapsed)
+    blocks = sys.getallocatedblocks()
+    res = parse_feed(body, service_name, engine)
+    blocks = sys.getallocatedblocks() - blocks
+    del res
+    tracemalloc.start()
+    parse_feed(body, service_name, engine)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return dict(
+        items=items,
+        bytes=len(body),
+        seconds=seconds,
+        items_per_second=items / seconds if seconds else None,
+        mb_per_second=len(body) / 1048576 / seconds if seconds else None,
+        peak_memory=peak,
+        allocations_per_item=blocks / items if items else None,
+    )
+
+
+def benchmark_parser(item_counts=(10, 1000, 10000, 100000),
+                     document_formats=DOCUMENT_FORMATS,
+                     description_size=2000, repeat=3, engines=None,
+                     fixtures=True) -> dict:
+    """
+    Benchmarks parser engines on generated and recorded documents
+
+    Generated documents show how parsing scales with the number of items,
+    recorded ones of the test fixtures keep the real-world markup, e.g.
+    stylesheets, CDATA and unused namespaces, in the numbers.
+
+    :param item_counts: Items per document
+    :param document_formats: Document formats
+    :param description_size: Characters of every item description
+    :param repeat: Timed runs per document
+    :param engines: Parser engine names, all installed engines by default
+    :param fixtures: Whether to benchmark the recorded documents of the
+        given formats too
+    :return: Report
+    """
+    results = list()
+    engines = engines or get_available_engines()
+    for document_format in document_formats:
+        service_name = ('feeds.feedburner.com'
+                        if document_format == 'feedburner' else 'example.org')
+        for items in item_counts:
+            document = generate_document(document_format, items,
+                                         description_size)
+            for engine in engines:
+                res = benchmark_document(document, service_name, engine,
+                                         repeat)
+                res.update(engine=engine, format=document_format,
+                           generated_items=items)
+                results.append(res)
+    for name, document_format, service_name in FIXTURE_DOCUMENTS:
+        if not fixtures or document_format not in document_formats:
+            continue
+        document = read_fixture_document(name)
+        for engine in engines:
+            res = benchmark_document(document, service_name, engine, repeat)
+            res.update(engine=engine, format=document_format, fixture=name)
+            results.append(res)
+    return dict(
+        python=platform.python_version(),
+        platform=platform.platform(),
+        description_size=description_size,
+        dates=benchmark_dates(1000),
+        results=results,
+    )
+
+
+if __name__ == '__main__':
+    results = benchmark_dates()
+    for parser_name, usec in results.items():
+        print(f'{parser_name}: {usec:.2f} usec per date')
+    print(f'speedup: {results["strptime"] / results["parse_date"]:.1f}x')
@@ -1,167 +1,853 @@
 import re
+import time
+import asyncio
 import datetime
-import json
-import psycopg2
+import functools
 import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
 
-def str_escape(orig: str) -> str:
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from feed_fetcher import stats
+from feed_fetcher.records import FEED_FIELDS, FEED_ITEM_FIELDS, FeedEntry, \
+    FeedMeta
+from feed_fetcher.statements import Statement, param_type
+
+_parser_executor = None
+
+
+def get_parser_executor():
+    """
+    Returns executor feeds are parsed in
+
+    Executor is created on first use according to FEED_PARSER_EXECUTOR
+    setting, which is either 'process', 'thread' or None to parse on the
+    event loop.
+
+    :return: Executor or None
+    """
+    global _parser_executor
+    if _parser_executor is None:
+        kind = settings.FEED_PARSER_EXECUTOR
+        if kind == 'process':
+            _parser_executor = ProcessPoolExecutor(
+                settings.FEED_PARSER_WORKERS)
+        elif kind == 'thread':
+            _parser_executor = ThreadPoolExecutor(
+                settings.FEED_PARSER_WORKERS)
+    return _parser_executor
+
+
+def shutdown_parser_executor():
     """
-    Escapes string for PostgreSQL
+    Shuts down the parser executor, if one was started
 
-    :param orig: Original
-    :return: Escaped
+    :return: None
     """
-    return re.sub(r"'", r"''", orig)
+    global _parser_executor
+    if _parser_executor is not None:
+        _parser_executor.shutdown()
+        _parser_executor = None
+
+
+def timed_parse_feed(text, service_name, engine, submitted):
+    """
+    Parses feed and measures how long it waited for and took in the executor
+
+    :param text: Feed document
+    :param service_name: Feed host
+    :param engine: Parser engine name
+    :param submitted: Timestamp the job was submitted at
+    :return: Parsed feed, seconds waited, seconds parsed
+    """
+    started = time.time()
+    res = parse_feed(text, service_name, engine)
+    return res, started - submitted, time.time() - started
 
 
 async def get_feed_as_dict(text, service_name):
-    res = dict(items=list())
-    namespaces = dict()
-    root = ET.fromstring(text)
-    feed_tag_mods = dict(lastBuildDate='last_build_date', pubDate='pub_date')
-    feed_item_tag_mods = dict(pubDate='pub_date')
-    feed_discard_tags = ['link']
-    feed_item_discard_tags = list()
-    if service_name == 'www.nu.nl':
-        namespaces['http://www.w3.org/2005/Atom'] = 'atom'
-        namespaces['http://purl.org/dc/elements/1.1/'] = 'dc'
-        namespaces['http://search.yahoo.com/mrss/'] = 'media'
-        date_format = "%a, %d %b %Y %H:%M:%S %z"
-        feed_tag_mods['atom:logo'] = 'image'
-        feed_item_tag_mods['atom:link'] = 'links'
-        feed_item_tag_mods['dc:creator'] = 'creator'
-        feed_item_tag_mods['dc:rights'] = 'rights'
-        feed_discard_tags.extend(['atom:link'])
-    elif service_name == 'feeds.feedburner.com':
-        namespaces['http://www.w3.org/2005/Atom'] = 'atom10'
-        namespaces[
-            'http://rssnamespace.org/feedburner/ext/1.0'] = 'feedburner'
-        namespaces['http://www.w3.org/1999/xhtml'] = 'xhtml'
-        date_format = "%a, %d %b %Y %H:%M:%S %Z"
-        feed_tag_mods['webMaster'] = 'web_master'
-        feed_discard_tags.extend(['xhtml:meta',
-                                  'feedburner:info',
-                                  'atom10:link'])
-        feed_item_discard_tags.extend(['comments'])
+    """
+    Parses feed without blocking the event loop
+
+    :param text: Feed document
+    :param service_name: Feed host
+    :return: Parsed feed
+    """
+    engine = settings.FEED_PARSER_ENGINE
+    executor = get_parser_executor()
+    if executor is None:
+        started = time.time()
+        res = parse_feed(text, service_name, engine)
+        stats.observe('parse', time.time() - started)
+        return res
+    loop = asyncio.get_event_loop()
+    res, waited, parsed = await loop.run_in_executor(
+        executor, timed_parse_feed, text, service_name, engine, time.time())
+    stats.observe('parse_wait', waited)
+    stats.observe('parse', parsed)
+    return res
+
+
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+RDF_NS = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#'
+RSS1_NS = 'http://purl.org/rss/1.0/'
+DC_NS = 'http://purl.org/dc/elements/1.1/'
+MEDIA_NS = 'http://search.yahoo.com/mrss/'
+
+# Root element tag of every supported feed format
+FEED_FORMATS = {
+    'rss': 'rss',
+    f'{{{ATOM_NS}}}feed': 'atom',
+    f'{{{RDF_NS}}}RDF': 'rdf',
+}
+
+# Hosts publishing categories as "Section - : Category / Subcategory"
+SPLIT_CATEGORY_SERVICES = ('feeds.feedburner.com',)
+
+# Parsed documents are fed to the XML parser in chunks of this many bytes
+PARSE_CHUNK_SIZE = 64 * 1024
+
+# Items inserted by one statement, one statement is prepared per batch size
+ITEM_BATCH_SIZE = 50
+
+
+def elem_text(elem):
+    """
+    Returns stripped text of the element
+
+    :param elem: Element
+    :return: Text or None
+    """
+    if elem.text is None:
+        return None
+    return elem.text.strip() or None
+
+
+MONTHS = {name: idx for idx, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct',
+     'nov', 'dec'), 1)}
+
+# UTC offsets in minutes of zone names used by feeds
+TIMEZONE_NAMES = {
+    'UT': 0, 'UTC': 0, 'GMT': 0, 'Z': 0, 'WET': 0,
+    'EST': -300, 'EDT': -240, 'CST': -360, 'CDT': -300,
+    'MST': -420, 'MDT': -360, 'PST': -480, 'PDT': -420,
+    'AKST': -540, 'AKDT': -480, 'HST': -600,
+    'BST': 60, 'CET': 60, 'MET': 60, 'WEST': 60,
+    'CEST': 120, 'MEST': 120, 'EET': 120, 'EEST': 180, 'MSK': 180,
+    'IST': 330, 'JST': 540, 'KST': 540,
+    'AEST': 600, 'AEDT': 660, 'NZST': 720, 'NZDT': 780,
+}
+
+RFC822_RE = re.compile(
+    r'\s*(?:[A-Za-z]+,?\s*)?(\d{1,2})[\s-]+([A-Za-z]{3})[A-Za-z]*\.?'
+    r'[\s-]+(\d{2,4})\s+(\d{1,2}):(\d{2})(?::(\d{2}))?'
+    r'(?:\s*([A-Za-z]+|[+-]\d{2}:?\d{2}))?')
+ISO8601_RE = re.compile(
+    r'\s*(\d{4})-(\d{2})-(\d{2})(?:[Tt ](\d{2}):(\d{2})'
+    r'(?::(\d{2})(?:[.,](\d+))?)?)?\s*(Z|z|[+-]\d{2}(?::?\d{2})?)?\s*$')
+
+
+@functools.lru_cache(maxsize=256)
+def get_timezone(token):
+    """
+    Returns timezone of a zone name or numeric offset token
+
+    Unknown zone names are taken for UTC rather than failing the date.
+
+    :param token: Zone token e.g. GMT, +0100, +01:00 or -05
+    :return: Timezone
+    """
+    if token is None:
+        return datetime.timezone.utc
+    if token[0] in '+-':
+        digits = token[1:].replace(':', '')
+        minutes = int(digits[:2]) * 60 + int(digits[2:4] or 0)
+        if token[0] == '-':
+            minutes = -minutes
+    else:
+        minutes = TIMEZONE_NAMES.get(token.upper(), 0)
+    if not minutes:
+        return datetime.timezone.utc
+    return datetime.timezone(datetime.timedelta(minutes=minutes))
+
+
+def parse_date(value):
+    """
+    Parses RFC-822 and ISO-8601 dates
+
+    Dates are tokenized by a single regular expression match, zone offsets
+    are looked up in a cache. Dates without a zone are taken for UTC.
+
+    :param value: Date string
+    :return: Datetime or None when date can't be parsed
+    """
+    if not value:
+        return None
+    match = RFC822_RE.match(value)
+    if match:
+        day, month, year, hour, minute, second, zone = match.groups()
+        month = MONTHS.get(month.lower())
+        if month is None:
+            return None
+        year = int(year)
+        if year < 100:
+            year += 2000 if year < 50 else 1900
+        microsecond = 0
     else:
-        return dict()
-    chanel = root[0]
-    for child_ele in chanel:
-        if child_ele.tag == 'item':
-            item_data = dict(category=list())
-            for item_elem in child_ele:
-                prefix, has_namespace, postfix = item_elem.tag.partition('}')
-                if has_namespace:
-                    key = namespaces.get(prefix.replace("{", ""), "NSPL")
-                    item_elem.tag = f'{key}:{postfix}'
-                if item_elem.tag in feed_item_tag_mods:
-                    item_elem.tag = feed_item_tag_mods[item_elem.tag]
-                if item_elem.tag in feed_item_discard_tags:
-                    continue
-
-                if item_elem.tag == 'pub_date' and date_format:
-                    item_data[item_elem.tag] = datetime.datetime.strptime(
-                        item_elem.text, date_format)
-                elif item_elem.tag == 'category':
-                    if service_name == 'feeds.feedburner.com':
-                        cleaned = re.sub(r'^.*:\ ', '', item_elem.text)
-                        cleaned = re.sub(r'\ /\ ', '/', cleaned)
-                        item_data[item_elem.tag].extend(cleaned.split('/'))
-                    else:
-                        item_data[item_elem.tag].append(item_elem.text)
-                elif item_elem.tag == 'enclosure':
-                    item_data[item_elem.tag] = item_elem.attrib['url']
-                elif item_elem.tag == 'links' and not item_elem.text:
-                    tag_name = f'{item_elem.attrib["rel"]}_{item_elem.tag}'
-                    if not item_data.get(tag_name):
-                        item_data[tag_name] = list()
-                    href = item_elem.attrib['href']
-                    item_data[tag_name].append([href, item_elem.attrib.get(
-                        'title', 'No title availabe for this link.')])
-                else:
-                    item_data[item_elem.tag] = item_elem.text
-            res['items'].append(item_data)
-        else:
-            prefix, has_namespace, postfix = child_ele.tag.partition('}')
-            if has_namespace:
-                key = namespaces.get(prefix.replace("{", ""), "NSPL")
-                child_ele.tag = f'{key}:{postfix}'
-            if child_ele.tag in feed_tag_mods:
-                child_ele.tag = feed_tag_mods[child_ele.tag]
-            if child_ele.tag in feed_discard_tags:
+        match = ISO8601_RE.match(value)
+        if not match:
+            return None
+        year, month, day, hour, minute, second, fraction, zone = \
+            match.groups()
+        year = int(year)
+        month = int(month)
+        microsecond = int(fraction[:6].ljust(6, '0')) if fraction else 0
+    try:
+        return datetime.datetime(
+            year, month, int(day), int(hour or 0), int(minute or 0),
+            int(second or 0), microsecond, get_timezone(zone))
+    except ValueError:
+        return None
+
+
+def set_text(field):
+    def handler(elem, data):
+        setattr(data, field, elem_text(elem))
+    return handler
+
+
+def set_default_text(field):
+    def handler(elem, data):
+        if getattr(data, field) is None:
+            setattr(data, field, elem_text(elem))
+    return handler
+
+
+def set_date(field):
+    def handler(elem, data):
+        setattr(data, field, parse_date(elem_text(elem)))
+    return handler
+
+
+def set_default_date(field):
+    def handler(elem, data):
+        if getattr(data, field) is None:
+            setattr(data, field, parse_date(elem_text(elem)))
+    return handler
+
+
+def set_int(field):
+    def handler(elem, data):
+        try:
+            setattr(data, field, int(elem_text(elem)))
+        except (TypeError, ValueError):
+            pass
+    return handler
+
+
+def set_child_text(field, child_tag):
+    def handler(elem, data):
+        child = elem.find(child_tag)
+        if child is not None:
+            setattr(data, field, elem_text(child))
+    return handler
+
+
+def set_image(url_tag):
+    def handler(elem, data):
+        url = elem.find(url_tag)
+        data.image = elem_text(url if url is not None else elem)
+    return handler
+
+
+def set_attr(field, attr):
+    def handler(elem, data):
+        if elem.get(attr):
+            setattr(data, field, elem.get(attr))
+    return handler
+
+
+def append_category(elem, data):
+    text = elem_text(elem)
+    if text:
+        data.category.append(text)
+
+
+def append_split_category(elem, data):
+    text = elem_text(elem)
+    if text:
+        cleaned = re.sub(r'^.*:\ ', '', text)
+        cleaned = re.sub(r'\ /\ ', '/', cleaned)
+        data.category.extend(cleaned.split('/'))
+
+
+def append_term(elem, data):
+    if elem.get('term'):
+        data.category.append(elem.get('term'))
+
+
+def set_media(elem, data):
+    media_type = elem.get('type') or ''
+    if (elem.get('url') and data.enclosure is None and
+            (elem.get('medium') == 'image' or
+             media_type.startswith('image/'))):
+        data.enclosure = elem.get('url')
+
+
+def set_thumbnail(elem, data):
+    if elem.get('url') and data.enclosure is None:
+        data.enclosure = elem.get('url')
+
+
+def set_atom_link(elem, data):
+    rel = elem.get('rel', 'alternate')
+    href = elem.get('href')
+    if not href:
+        return
+    if rel == 'alternate':
+        if data.link is None:
+            data.link = href
+    elif rel == 'enclosure':
+        if data.enclosure is None:
+            data.enclosure = href
+    elif rel == 'related':
+        if data.related_links is None:
+            data.related_links = list()
+        data.related_links.append(
+            [href, elem.get('title', 'No title availabe for this link.')])
+
+
+def set_feed_link(elem, data):
+    if elem.get('href') and elem.get('rel', 'alternate') == 'alternate':
+        if data.link is None:
+            data.link = elem.get('href')
+
+
+def set_rss_related_link(elem, data):
+    if elem.get('rel') == 'related':
+        set_atom_link(elem, data)
+
+
+# Tag to handler mapping of feed level and item level elements per format.
+# Namespaced tags are given as (namespace, tag) pairs.
+FORMAT_RULES = {
+    'rss': dict(
+        containers=('channel',),
+        item_tag='item',
+        feed={
+            'title': set_text('title'),
+            'link': set_text('link'),
+            'description': set_text('description'),
+            'language': set_text('language'),
+            'copyright': set_text('copyright'),
+            'docs': set_text('docs'),
+            'webMaster': set_text('web_master'),
+            'ttl': set_int('ttl'),
+            'lastBuildDate': set_date('last_build_date'),
+            'pubDate': set_date('pub_date'),
+            'image': set_image('url'),
+            (ATOM_NS, 'logo'): set_text('image'),
+            (DC_NS, 'language'): set_default_text('language'),
+            (DC_NS, 'rights'): set_default_text('copyright'),
+            (DC_NS, 'date'): set_default_date('pub_date'),
+        },
+        items={
+            'title': set_text('title'),
+            'link': set_text('link'),
+            'description': set_text('description'),
+            'guid': set_text('guid'),
+            'author': set_text('author'),
+            'pubDate': set_date('pub_date'),
+            'category': append_category,
+            'enclosure': set_attr('enclosure', 'url'),
+            (ATOM_NS, 'link'): set_rss_related_link,
+            (DC_NS, 'creator'): set_text('creator'),
+            (DC_NS, 'rights'): set_text('rights'),
+            (DC_NS, 'date'): set_default_date('pub_date'),
+            (DC_NS, 'subject'): append_category,
+            (MEDIA_NS, 'content'): set_media,
+            (MEDIA_NS, 'thumbnail'): set_thumbnail,
+        },
+    ),
+    'atom': dict(
+        containers=((ATOM_NS, 'feed'),),
+        item_tag=(ATOM_NS, 'entry'),
+        feed={
+            (ATOM_NS, 'title'): set_text('title'),
+            (ATOM_NS, 'subtitle'): set_text('description'),
+            (ATOM_NS, 'link'): set_feed_link,
+            (ATOM_NS, 'rights'): set_text('copyright'),
+            (ATOM_NS, 'updated'): set_date('last_build_date'),
+            (ATOM_NS, 'logo'): set_text('image'),
+            (ATOM_NS, 'icon'): set_default_text('image'),
+        },
+        items={
+            (ATOM_NS, 'title'): set_text('title'),
+            (ATOM_NS, 'link'): set_atom_link,
+            (ATOM_NS, 'id'): set_text('guid'),
+            (ATOM_NS, 'summary'): set_text('description'),
+            (ATOM_NS, 'content'): set_default_text('description'),
+            (ATOM_NS, 'published'): set_date('pub_date'),
+            (ATOM_NS, 'updated'): set_default_date('pub_date'),
+            (ATOM_NS, 'author'): set_child_text('author',
+                                                f'{{{ATOM_NS}}}name'),
+            (ATOM_NS, 'category'): append_term,
+            (ATOM_NS, 'rights'): set_text('rights'),
+            (DC_NS, 'creator'): set_text('creator'),
+            (MEDIA_NS, 'content'): set_media,
+            (MEDIA_NS, 'thumbnail'): set_thumbnail,
+        },
+    ),
+    'rdf': dict(
+        containers=((RDF_NS, 'RDF'), (RSS1_NS, 'channel')),
+        item_tag=(RSS1_NS, 'item'),
+        feed={
+            (RSS1_NS, 'title'): set_text('title'),
+            (RSS1_NS, 'link'): set_text('link'),
+            (RSS1_NS, 'description'): set_text('description'),
+            (RSS1_NS, 'image'): set_image(f'{{{RSS1_NS}}}url'),
+            (DC_NS, 'language'): set_text('language'),
+            (DC_NS, 'rights'): set_text('copyright'),
+            (DC_NS, 'date'): set_date('pub_date'),
+        },
+        items={
+            (RSS1_NS, 'title'): set_text('title'),
+            (RSS1_NS, 'link'): set_text('link'),
+            (RSS1_NS, 'description'): set_text('description'),
+            (DC_NS, 'creator'): set_text('creator'),
+            (DC_NS, 'rights'): set_text('rights'),
+            (DC_NS, 'date'): set_date('pub_date'),
+            (DC_NS, 'subject'): append_category,
+        },
+    ),
+}
+
+
+def clark_tag(tag) -> str:
+    """
+    Returns tag in {namespace}tag notation used by ElementTree
+
+    :param tag: Tag or (namespace, tag) pair
+    :return: Tag
+    """
+    if isinstance(tag, tuple):
+        return f'{{{tag[0]}}}{tag[1]}'
+    return tag
+
+
+@functools.lru_cache(maxsize=None)
+def get_dispatch_tables(feed_format, split_categories=False):
+    """
+    Compiles tag to handler tables of a feed format
+
+    Tables hold tags of every known namespace, namespaces may be declared
+    on any element of the document. Tables are cached, so they are built
+    once per format.
+
+    :param feed_format: Format name
+    :param split_categories: Split categories into sections
+    :return: Feed level parent tags, item tag, feed table and item table
+    """
+    rules = FORMAT_RULES[feed_format]
+    tables = list()
+    for table_rules in (rules['feed'], rules['items']):
+        table = dict()
+        for tag, handler in table_rules.items():
+            if handler is append_category and split_categories:
+                handler = append_split_category
+            table[clark_tag(tag)] = handler
+        tables.append(table)
+    containers = frozenset(clark_tag(tag) for tag in rules['containers'])
+    return (containers, clark_tag(rules['item_tag']),
+            *tables)
+
+
+class ParserEngine:
+    """
+    XML backend of the feed parser
+
+    Engines create ElementTree compatible pull parsers, feed conversion
+    doesn't depend on the engine used.
+    """
+
+    name = None
+
+    def pull_parser(self, events, text=False):
+        """
+        Creates pull parser
+
+        :param events: Events to report
+        :param text: Document is fed as str instead of bytes
+        :return: Pull parser
+        """
+        raise NotImplementedError
+
+    def encode(self, data):
+        """
+        Converts document chunk to what the pull parser accepts
+
+        :param data: Document chunk
+        :return: Document chunk
+        """
+        return data
+
+
+class EtreeEngine(ParserEngine):
+    """
+    Standard library xml.etree.ElementTree engine
+    """
+
+    name = 'etree'
+
+    def pull_parser(self, events, text=False):
+        return ET.XMLPullParser(events=events)
+
+
+class LxmlEngine(ParserEngine):
+    """
+    lxml engine
+
+    External entities and network access are disabled. Documents fed as str
+    are encoded to UTF-8, overriding their declared encoding the same way
+    the standard library parser does.
+    """
+
+    name = 'lxml'
+
+    def pull_parser(self, events, text=False):
+        return lxml_etree.XMLPullParser(
+            events=events, encoding='utf-8' if text else None,
+            resolve_entities=False, no_network=True)
+
+    def encode(self, data):
+        if isinstance(data, str):
+            return data.encode()
+        return data
+
+
+PARSER_ENGINES = {
+    'etree': EtreeEngine(),
+    'lxml': LxmlEngine(),
+}
+
+
+def get_available_engines() -> list:
+    """
+    Returns names of parser engines which can be used
+
+    :return: List of engine names
+    """
+    return [name for name in PARSER_ENGINES
+            if name != 'lxml' or lxml_etree is not None]
+
+
+def get_parser_engine(name=None) -> ParserEngine:
+    """
+    Returns parser engine, FEED_PARSER_ENGINE setting by default
+
+    lxml engine falls back to the standard library one when lxml isn't
+    installed.
+
+    :param name: Engine name
+    :return: Parser engine
+    """
+    name = name or settings.FEED_PARSER_ENGINE
+    if name not in PARSER_ENGINES:
+        raise ImproperlyConfigured(f'Unknown feed parser engine {name}')
+    if name == 'lxml' and lxml_etree is None:
+        name = 'etree'
+    return PARSER_ENGINES[name]
+
+
+# Errors the XML backends raise on documents which aren't well-formed
+PARSE_ERRORS = (ET.ParseError,) if lxml_etree is None else (
+    ET.ParseError, lxml_etree.ParseError)
+
+
+class FeedParseError(ValueError):
+    """
+    Document isn't well-formed XML, e.g. an HTML error page or a truncated
+    body
+
+    Raised instead of the error of the XML backend, so it can be passed
+    between processes.
+    """
+
+
+class FeedParser:
+    """
+    Incremental RSS 2.0, Atom and RDF parser
+
+    Format is detected from the root element. Elements are converted by O(1)
+    lookups in the format's dispatch tables as soon as their end tag is
+    parsed, then released, so memory used doesn't grow with the number of
+    items in the document. Document is fed in chunks as it arrives. Items
+    without a publication date are dated by the time the document was
+    fetched.
+    """
+
+    def __init__(self, service_name, engine=None, fetch_date=None):
+        self.split_categories = service_name in SPLIT_CATEGORY_SERVICES
+        self.fetch_date = fetch_date or datetime.datetime.now(
+            datetime.timezone.utc)
+        self.engine = get_parser_engine(engine)
+        self.parser = None
+        self.res = FeedMeta()
+        self.stack = list()
+        self.feed_format = None
+        self.tables = None
+
+    def feed(self, data):
+        """
+        Parses next chunk of the document
+
+        :param data: Document chunk
+        :return: None
+        :raise FeedParseError: Document is malformed
+        """
+        if self.parser is None:
+            self.parser = self.engine.pull_parser(
+                ('start', 'end'), isinstance(data, str))
+        try:
+            self.parser.feed(self.engine.encode(data))
+            self._read_events()
+        except PARSE_ERRORS as e:
+            raise FeedParseError(str(e))
+
+    def close(self) -> FeedMeta:
+        """
+        Finishes parsing
+
+        :return: Parsed feed, empty when document isn't a feed
+        :raise FeedParseError: Document is malformed or truncated
+        """
+        if self.parser is None:
+            self.parser = self.engine.pull_parser(('start', 'end'))
+        try:
+            self.parser.close()
+            self._read_events()
+        except PARSE_ERRORS as e:
+            raise FeedParseError(str(e))
+        return self.res
+
+    def _start_root(self, root):
+        self.feed_format = FEED_FORMATS.get(root.tag)
+        if self.feed_format:
+            self.tables = get_dispatch_tables(self.feed_format,
+                                              self.split_categories)
+
+    def _read_events(self):
+        for event, elem in self.parser.read_events():
+            if event == 'start':
+                if not self.stack:
+                    self._start_root(elem)
+                self.stack.append(elem)
+                continue
+            self.stack.pop()
+            if not self.stack:
+                continue
+            parent = self.stack[-1]
+            if self.tables is None:
+                if len(self.stack) == 1:
+                    self._release(parent, elem)
                 continue
+            containers, item_tag, feed_table, item_table = self.tables
+            if elem.tag == item_tag:
+                item = self._parse_item(elem, item_table)
+                if item:
+                    self.res.items.append(item)
+            elif parent.tag in containers:
+                handler = feed_table.get(elem.tag)
+                if handler:
+                    handler(elem, self.res)
+            elif len(self.stack) > 1:
+                # Element is a part of an item or a feed level element
+                continue
+            self._release(parent, elem)
 
-            if (child_ele.tag in ['last_build_date', 'pub_date']
-                    and date_format):
-                res[child_ele.tag] = datetime.datetime.strptime(child_ele.text,
-                                                                date_format)
-            elif child_ele.tag == 'ttl':
-                res[child_ele.tag] = int(child_ele.text)
-            elif child_ele.tag == 'image' and not child_ele.text:
-                res[child_ele.tag] = child_ele.find('url').text
-            else:
-                res[child_ele.tag] = child_ele.text
-    return res
+    @staticmethod
+    def _release(parent, elem):
+        """
+        Frees memory held by a converted element
+
+        Element is cleared and its siblings converted before it are deleted.
+        lxml may be building elements which follow it, removing the element
+        it has just closed corrupts its memory, so the element itself is
+        deleted once the next sibling is converted.
+
+        :param parent: Parent element
+        :param elem: Converted element
+        :return: None
+        """
+        elem.clear()
+        while parent[0] is not elem:
+            del parent[0]
+
+    def _parse_item(self, elem, item_table):
+        item = FeedEntry()
+        for child in elem:
+            handler = item_table.get(child.tag)
+            if handler:
+                handler(child, item)
+        if item.guid is None:
+            item.guid = elem.get(f'{{{RDF_NS}}}about') or item.link
+        if item.description is None:
+            item.description = ''
+        if item.pub_date is None:
+            item.pub_date = self.fetch_date
+        if not (item.guid and item.link and item.title):
+            return None
+        return item
+
+
+def parse_feed(text, service_name, engine=None,
+               fetch_date=None) -> FeedMeta:
+    """
+    Parses RSS 2.0, Atom or RDF document
 
+    Result consists of plain python objects, so it can be passed between
+    processes. Document is fed in chunks, so parsed items are released
+    while the rest of it is parsed.
 
-async def push_to_db(feed_id, feed_dict, conn, uid):
-    feed_data = dict()
-    feed_items = list()
-    if 'items' in feed_dict:
-        for item in feed_dict['items']:
-            item['feed_id'] = feed_id
-        feed_items = feed_dict['items']
-        del feed_dict['items']
-        feed_data = feed_dict
-    async with conn.cursor() as cur:
-        if feed_data:
-            update_strs = list()
-            for key, value in feed_data.items():
-                if isinstance(value, str):
-                    update_strs.append(f"{key} = '{value}'")
-                elif isinstance(value, datetime.datetime):
-                    update_strs.append(f"{key} = '{value}'")
-                elif isinstance(value, list):
-                    update_strs.append(f"{key} = '{json.dumps(value)}'")
-                else:
-                    update_strs.append(f'{key} = {value}')
-            await cur.execute(f'UPDATE feed SET {", ".join(update_strs)} '
-                              f'WHERE id = {feed_id}')
-        for feed_item in feed_items:
-            values = list()
-            for value in feed_item.values():
-                if isinstance(value, str):
-                    value = re.sub(r"\'", '\"', value)
-                    values.append(f"'{str_escape(value)}'")
-                elif isinstance(value, datetime.datetime):
-                    values.append(f"'{value}'")
-                elif isinstance(value, list):
-                    fin_value = ''
-                    for idx, val in enumerate(value):
-                        if isinstance(val, list):
-                            val_items = '","'.join(
-                                [str_escape(v) for v in val])
-                            fin_value = (fin_value + "{" + f'"{val_items}"'
-                                         + "}")
-                        else:
-                            fin_value = f'"{str_escape(val)}"'
-                        if idx < len(value) - 1:
-                            fin_value += ','
-                    values.append("'{" + fin_value + "}'")
-                else:
-                    values.append(f'{value}')
-            keys = list(feed_item.keys())
-            keys.append('create_date')
-            keys.append('user_id')
-            keys.append('favorite')
-            keys.append('read')
-            values.append(f"'{datetime.datetime.now()}'")
-            values.append(f'{uid}')
-            values.append(f'False')
-            values.append(f'False')
-            try:
-                await cur.execute(f'INSERT INTO feed_item ({",".join(keys)}) '
-                                  f'VALUES ({",".join(values)})')
-            except psycopg2.errors.UniqueViolation:
-                pass
+    :param text: Feed document
+    :param service_name: Feed host
+    :param engine: Parser engine name, FEED_PARSER_ENGINE setting by default
+    :param fetch_date: Date of items without one, current time by default
+    :return: Parsed feed
+    :raise FeedParseError: Document is malformed
+    """
+    parser = FeedParser(service_name, engine, fetch_date)
+    for idx in range(0, len(text), PARSE_CHUNK_SIZE):
+        parser.feed(text[idx:idx + PARSE_CHUNK_SIZE])
+    return parser.close()
+
+
+# Parsed values of feed columns, columns which weren't parsed keep theirs
+FEED_META_VALUES = [f'COALESCE(${idx}::{pg_type}, {key})'
+                    for idx, (key, pg_type) in enumerate(FEED_FIELDS, 1)]
+
+# Feeds whose stored meta data equals the parsed one aren't updated, so an
+# unchanged channel creates no new row version
+UPDATE_FEEDS = Statement(
+    'update_feeds',
+    [param_type(pg_type) for _, pg_type in FEED_FIELDS] + ['int[]'],
+    'UPDATE feed SET ' + ', '.join(
+        f'{key} = {value}'
+        for (key, _), value in zip(FEED_FIELDS, FEED_META_VALUES)) +
+    f' WHERE id = ANY(${len(FEED_FIELDS) + 1}) '
+    f'AND ({", ".join(key for key, _ in FEED_FIELDS)}) IS DISTINCT FROM '
+    f'({", ".join(FEED_META_VALUES)})')
+
+
+def get_retention_filter(table) -> str:
+    """
+    Returns condition skipping entries older than FEED_ITEM_RETENTION_MONTHS
+
+    Feed items of expired partitions are dropped, their entries mustn't be
+    delivered to the subscribers again while they are still in the feed.
+    feed_item can't enforce unique (entry, user) because it's partitioned,
+    items are delivered to a subscriber once by checking feed_item, a url is
+    processed by one worker at a time.
+
+    :param table: Alias of the entry table
+    :return: SQL condition starting with AND or empty string
+    """
+    months = settings.FEED_ITEM_RETENTION_MONTHS
+    if months is None:
+        return ''
+    return (f' AND {table}.create_date > '
+            f"now() - interval '{int(months)} months'")
+
+
+@functools.lru_cache(maxsize=None)
+def get_insert_statement(rows) -> Statement:
+    """
+    Returns statement storing rows of items and delivering them to subscribers
+
+    Items are stored in entry once per source url and guid, subscribers get
+    a feed_item row referring to the entry. Entries stored before are
+    delivered to subscribers which don't have them yet, unless they are
+    older than the retention. Parameters are values of every item in column
+    order followed by the source url, Feed IDs and User IDs of the
+    subscribers.
+
+    :param rows: Number of items
+    :return: Statement
+    """
+    columns = ', '.join(key for key, _ in FEED_ITEM_FIELDS)
+    width = len(FEED_ITEM_FIELDS)
+    values = ', '.join(
+        '(' + ', '.join(f'${row * width + idx}::{pg_type}'
+                        for idx, (_, pg_type) in
+                        enumerate(FEED_ITEM_FIELDS, 1)) + ')'
+        for row in range(rows))
+    source = rows * width + 1
+    arg_types = [param_type(pg_type) for _, pg_type in FEED_ITEM_FIELDS]
+    return Statement(
+        f'insert_entries_{rows}',
+        arg_types * rows + ['varchar', 'int[]', 'int[]'],
+        f'WITH i ({columns}) AS (VALUES {values}), '
+        f'new_entries AS ('
+        f'INSERT INTO entry (source, {columns}, create_date) '
+        f'SELECT ${source}, i.*, now() FROM i '
+        f'ON CONFLICT (source, guid) DO NOTHING RETURNING id, pub_date), '
+        f'entries AS ('
+        f'SELECT id, pub_date FROM new_entries UNION ALL '
+        f'SELECT entry.id, entry.pub_date FROM entry JOIN i USING (guid) '
+        f'WHERE entry.source = ${source}{get_retention_filter("entry")}) '
+        f'INSERT INTO feed_item (entry_id, feed_id, user_id, pub_date, '
+        f'create_date, favorite, read) '
+        f'SELECT DISTINCT e.id, s.feed_id, s.user_id, e.pub_date, now(), '
+        f'FALSE, FALSE FROM entries AS e '
+        f'CROSS JOIN unnest(${source + 1}::int[], ${source + 2}::int[]) '
+        f'AS s(feed_id, user_id) '
+        f'WHERE NOT EXISTS (SELECT 1 FROM feed_item AS f '
+        f'WHERE f.entry_id = e.id AND f.user_id = s.user_id)')
+
+
+async def push_to_db(source, subscriptions, feed_meta: FeedMeta, cur,
+                     items=True) -> int:
+    """
+    Applies parsed feed to every subscribed feed
+
+    Meta data of all subscribed feeds is updated by one statement, columns
+    which weren't parsed keep their values. Feeds whose meta data hasn't
+    changed are skipped. Only known feed columns are written, so channel
+    link doesn't overwrite the subscribed url. Items are stored once for the
+    url and delivered to every subscriber in batches of up to
+    ITEM_BATCH_SIZE items per statement, values are bound positionally in
+    column order.
+
+    :param source: Feed url
+    :param subscriptions: List of (Feed ID, User ID) subscribed to the url
+    :param feed_meta: Parsed feed
+    :param cur: DB cursor
+    :param items: Insert items too, False when they are ingested by a buffer
+    :return: Number of feed items delivered to subscribers
+    """
+    feed_ids = [feed_id for feed_id, uid in subscriptions]
+    user_ids = [uid for feed_id, uid in subscriptions]
+    feed_items = feed_meta.items if items else list()
+    inserted = 0
+    if feed_meta.columns():
+        values = [getattr(feed_meta, key) for key, _ in FEED_FIELDS]
+        await UPDATE_FEEDS.execute(cur, values + [feed_ids])
+        stats.incr('feed_meta_writes', cur.rowcount)
+        stats.incr('feed_meta_writes_avoided',
+                   len(feed_ids) - cur.rowcount)
+    for idx in range(0, len(feed_items), ITEM_BATCH_SIZE):
+        batch = feed_items[idx:idx + ITEM_BATCH_SIZE]
+        params = list()
+        for feed_item in batch:
+            params.extend(feed_item)
+        params.extend((source, feed_ids, user_ids))
+        await get_insert_statement(len(batch)).execute(cur, params)
+        inserted += cur.rowcount
+    return inserted
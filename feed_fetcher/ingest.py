@@ -0,0 +1,283 @@
+import io
+import time
+import asyncio
+import datetime
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from feed_fetcher import stats
+from feed_fetcher.helpers import get_retention_filter
+from feed_fetcher.records import FEED_ITEM_FIELDS
+from feed_fetcher.statements import param_type
+
+STAGING_COLUMNS = [name for name, _ in FEED_ITEM_FIELDS] + [
+    'source', 'feed_ids', 'user_ids']
+
+# Staging columns are unconstrained, values are truncated to the entry
+# column types when merged. Every item is staged once together with its
+# subscribers.
+CREATE_STAGING = (
+    'CREATE TEMP TABLE IF NOT EXISTS entry_staging (' +
+    ', '.join(f'{name} {param_type(pg_type)}'
+              for name, pg_type in FEED_ITEM_FIELDS) +
+    ', source varchar, feed_ids integer[], user_ids integer[]) '
+    'ON COMMIT DELETE ROWS')
+
+COPY_STAGING = (f'COPY entry_staging ({", ".join(STAGING_COLUMNS)}) '
+                f'FROM STDIN')
+
+SAVE_VALIDATORS = (
+    'UPDATE feed SET etag = v.etag::varchar(200), '
+    'last_modified = v.last_modified::varchar(100), '
+    'content_digest = v.content_digest '
+    'FROM (VALUES %s) AS v(id, etag, last_modified, content_digest) '
+    'WHERE feed.id = v.id')
+
+
+@functools.lru_cache(maxsize=None)
+def get_merge_query() -> str:
+    """
+    Returns query merging staged rows into entry and feed_item
+
+    Entries stored before the flush are delivered to subscribers which don't
+    have them yet, same as by the insert statement of push_to_db.
+
+    :return: SQL
+    """
+    return (
+        f'WITH new_entries AS ('
+        f'INSERT INTO entry (source, '
+        f'{", ".join(name for name, _ in FEED_ITEM_FIELDS)}, create_date) '
+        f'SELECT source::varchar(200), ' +
+        ', '.join(f'{name}::{pg_type}'
+                  for name, pg_type in FEED_ITEM_FIELDS) +
+        f', now() FROM entry_staging '
+        f'ON CONFLICT (source, guid) DO NOTHING '
+        f'RETURNING id, source, guid, pub_date), '
+        f'entries AS ('
+        f'SELECT * FROM new_entries UNION ALL '
+        f'SELECT id, source, guid, pub_date FROM entry '
+        f'WHERE (source, guid) IN ('
+        f'SELECT source, guid::varchar(200) FROM entry_staging)'
+        f'{get_retention_filter("entry")}) '
+        f'INSERT INTO feed_item (entry_id, feed_id, user_id, pub_date, '
+        f'create_date, favorite, read) '
+        f'SELECT DISTINCT e.id, u.feed_id, u.user_id, e.pub_date, now(), '
+        f'FALSE, FALSE FROM entry_staging AS s '
+        f'JOIN entries AS e ON e.source = s.source '
+        f'AND e.guid = s.guid::varchar(200) '
+        f'CROSS JOIN unnest(s.feed_ids, s.user_ids) AS u(feed_id, user_id) '
+        f'WHERE NOT EXISTS (SELECT 1 FROM feed_item AS f '
+        f'WHERE f.entry_id = e.id AND f.user_id = u.user_id)')
+
+
+def array_literal(values) -> str:
+    """
+    Formats list as Postgres array literal
+
+    :param values: List of strings or of lists of strings
+    :return: Array literal e.g. {"a","b"}
+    """
+    elements = list()
+    for value in values:
+        if value is None:
+            elements.append('NULL')
+        elif isinstance(value, (list, tuple)):
+            elements.append(array_literal(value))
+        else:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+            elements.append(f'"{value}"')
+    return '{' + ','.join(elements) + '}'
+
+
+def copy_value(value) -> str:
+    """
+    Formats value as a field of COPY text format
+
+    :param value: Value
+    :return: Escaped field
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, (list, tuple)):
+        value = array_literal(value)
+    elif isinstance(value, datetime.datetime):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return (value.replace('\\', '\\\\').replace('\n', '\\n')
+            .replace('\r', '\\r').replace('\t', '\\t'))
+
+
+def copy_rows(rows) -> str:
+    """
+    Formats rows as COPY text format
+
+    :param rows: Rows of staging column values
+    :return: COPY data
+    """
+    return ''.join('\t'.join(map(copy_value, row)) + '\n' for row in rows)
+
+
+class IngestWriter:
+    """
+    Synchronous connection buffered items are written over
+
+    Rows are copied into a temporary staging table and merged into entry
+    and feed_item by a single statement, together with the validators of
+    the documents they came from, in one transaction. aiopg connections are
+    asynchronous and don't support COPY, so the writer is called from a
+    thread.
+    """
+
+    def __init__(self, dsn):
+        self.dsn = dsn
+        self.conn = None
+
+    def connect(self):
+        self.conn = psycopg2.connect(self.dsn)
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.execute(CREATE_STAGING)
+
+    def write(self, rows, validators) -> int:
+        """
+        Merges rows into entry and feed_item and saves validators
+
+        :param rows: Rows of staging column values
+        :param validators: List of (Feed ID, etag, last modified, digest)
+        :return: Number of feed items delivered to subscribers
+        """
+        if self.conn is None or self.conn.closed:
+            self.connect()
+        with self.conn:
+            with self.conn.cursor() as cur:
+                cur.copy_expert(COPY_STAGING, io.StringIO(copy_rows(rows)))
+                cur.execute(get_merge_query())
+                inserted = cur.rowcount
+                if validators:
+                    execute_values(cur, SAVE_VALIDATORS, validators)
+        return inserted
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class IngestBuffer:
+    """
+    Write behind buffer of parsed items shared by the workers
+
+    Workers add items of processed documents and continue with the next
+    url, items of many feeds are written together once flush_rows rows are
+    buffered or every flush_interval seconds. Workers wait while max_rows
+    rows are waiting to be flushed. Validators of a document are saved
+    together with its items, so a document whose items were lost with the
+    buffer is processed again on the next scan.
+    """
+
+    def __init__(self, writer, flush_rows, flush_interval, max_rows):
+        self.writer = writer
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.rows = list()
+        self.validators = list()
+        self.closed = False
+        self.full = asyncio.Event()
+        self.drained = asyncio.Condition()
+        self.flushing = asyncio.Lock()
+        self.executor = ThreadPoolExecutor(1)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def fits(self, size) -> bool:
+        return not self.rows or len(self.rows) + size <= self.max_rows
+
+    async def put(self, source, subscriptions, items, validators=None):
+        """
+        Adds items of a document, waits while the buffer is full
+
+        :param source: Feed url
+        :param subscriptions: List of (Feed ID, User ID) subscribed to the url
+        :param items: Parsed feed items
+        :param validators: (etag, last modified, digest) of the document
+        :return: None
+        """
+        if self.closed:
+            raise RuntimeError('Ingest buffer is closed')
+        feed_ids = [feed_id for feed_id, uid in subscriptions]
+        user_ids = [uid for feed_id, uid in subscriptions]
+        rows = [tuple(item) + (source, feed_ids, user_ids) for item in items]
+        if not self.fits(len(rows)):
+            stats.incr('ingest_waits')
+            self.full.set()
+            async with self.drained:
+                await self.drained.wait_for(lambda: self.fits(len(rows)))
+        self.rows.extend(rows)
+        if validators is not None:
+            self.validators.extend((feed_id,) + tuple(validators)
+                                   for feed_id, _ in subscriptions)
+        if len(self.rows) >= self.flush_rows:
+            self.full.set()
+
+    async def flush(self):
+        """
+        Writes buffered rows and validators
+
+        Failed writes are logged and dropped, their documents are processed
+        again on the next scan because their validators weren't saved.
+
+        :return: None
+        """
+        async with self.flushing:
+            if not self.rows and not self.validators:
+                return
+            rows, validators = self.rows, self.validators
+            self.rows, self.validators = list(), list()
+            async with self.drained:
+                self.drained.notify_all()
+            loop = asyncio.get_event_loop()
+            started = time.time()
+            try:
+                inserted = await loop.run_in_executor(
+                    self.executor, self.writer.write, rows, validators)
+            except psycopg2.Error as e:
+                print(f'Ingest of {len(rows)} rows failed: {e}')
+                stats.incr('ingest_failures')
+                return
+            stats.observe('ingest_flush', time.time() - started)
+            stats.incr('ingest_rows', len(rows))
+            stats.incr('items_inserted', inserted)
+
+    async def run(self):
+        """
+        Flushes the buffer until it is closed
+
+        :return: None
+        """
+        while not self.closed:
+            try:
+                await asyncio.wait_for(self.full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.full.clear()
+            await self.flush()
+
+    async def close(self):
+        """
+        Flushes what is left in the buffer and closes the writer
+
+        :return: None
+        """
+        self.closed = True
+        self.full.set()
+        await self.flush()
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self.executor, self.writer.close)
+        self.executor.shutdown()
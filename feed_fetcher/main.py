@@ -1,26 +1,137 @@
 #!/usr/bin/env python3
 
 import asyncio
+import multiprocessing
+import queue
+import signal
+import sys
+import time
 from asyncio import AbstractEventLoop
+from collections import Counter
 
 from django.conf import settings
-from feed_fetcher.workers import worker, collect_tasks
+from feed_fetcher.helpers import shutdown_parser_executor
+from feed_fetcher.ingest import IngestBuffer, IngestWriter
+from feed_fetcher.scheduler import Scheduler
+from feed_fetcher.stats import report_stats, format_stats
+from feed_fetcher.workers import worker, collect_tasks, get_http_session, \
+    get_dsn, get_db_pool
 
 
-def main():
+def main(shard=0, shards=1, status=None):
     loop: AbstractEventLoop = asyncio.get_event_loop()
     loop.set_debug(settings.DEBUG)
-    data = asyncio.Queue()
+    data = asyncio.Queue(maxsize=settings.FEED_QUEUE_SIZE)
+    scheduler = Scheduler(shard, shards)
+    session = loop.run_until_complete(get_http_session())
+    pool = loop.run_until_complete(get_db_pool())
+    ingest = None
+    if settings.FEED_INGEST_BUFFER:
+        ingest = IngestBuffer(IngestWriter(get_dsn()),
+                              settings.FEED_INGEST_FLUSH_ROWS,
+                              settings.FEED_INGEST_FLUSH_MS / 1000,
+                              settings.FEED_INGEST_MAX_ROWS)
 
-    tasks = [worker(data, _) for _ in range(settings.FEED_WORKERS_COUNT)]
-    tasks.append(collect_tasks(data))
+    tasks = [worker(data, session, scheduler, pool, _, ingest)
+             for _ in range(settings.FEED_WORKERS_COUNT)]
+    tasks.append(collect_tasks(data, scheduler, pool))
+    tasks.append(report_stats(settings.FEED_STATS_INTERVAL, status, shard))
+    if ingest is not None:
+        tasks.append(ingest.run())
     task = asyncio.gather(*tasks)
-    loop.run_until_complete(task)
-    loop.close()
+    # docker stop and the supervisor send SIGTERM, the tasks are cancelled so
+    # the ingest buffer is flushed before the process exits
+    loop.add_signal_handler(signal.SIGTERM, task.cancel)
+    try:
+        loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        print('Fetcher stopped, flushing buffered items')
+    finally:
+        if ingest is not None:
+            loop.run_until_complete(ingest.close())
+        loop.run_until_complete(session.close())
+        pool.close()
+        loop.run_until_complete(pool.wait_closed())
+        loop.close()
+        shutdown_parser_executor()
+
+
+# Seconds a fetcher process has to run before its restart back off is reset
+HEALTHY_RUN = 60
+
+
+def supervise(processes):
+    """
+    Runs fetcher event loops in several processes
+
+    Every process fetches its own shard of the feeds. Processes which exit
+    are restarted with exponential back off, which starts over once a
+    process has run for HEALTHY_RUN seconds, and their counters are printed
+    combined. SIGTERM stops the processes, which flush their buffers first.
+
+    :param processes: Number of processes
+    :return: None
+    """
+    ctx = multiprocessing.get_context('fork')
+    status = ctx.Queue()
+    children = dict()
+    restarts = Counter()
+    # Exits in a row, each one before the process ran for HEALTHY_RUN
+    failures = Counter()
+    restart_at = dict()
+    started_at = dict()
+    snapshots = dict()
+    report_at = time.monotonic() + settings.FEED_STATS_INTERVAL
+
+    def start(shard):
+        child = ctx.Process(target=main, args=(shard, processes, status),
+                            name=f'feed_fetcher[{shard}]')
+        child.start()
+        children[shard] = child
+        started_at[shard] = time.monotonic()
+        print(f'Fetcher Process [{shard}] Started, pid {child.pid}')
+
+    # Exits through the finally block below, which terminates the children
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit())
+    for shard in range(processes):
+        start(shard)
+    try:
+        while True:
+            try:
+                shard, snapshot = status.get(timeout=1)
+                snapshots[shard] = snapshot
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            for shard, child in children.items():
+                if child.is_alive() or shard in restart_at:
+                    continue
+                if now - started_at[shard] > HEALTHY_RUN:
+                    failures[shard] = 0
+                failures[shard] += 1
+                restarts[shard] += 1
+                wait = min(2 ** (failures[shard] - 1), 60)
+                print(f'Fetcher Process [{shard}] exited with code '
+                      f'{child.exitcode}, restarting in {wait}s')
+                restart_at[shard] = now + wait
+            for shard, when in list(restart_at.items()):
+                if when <= now:
+                    del restart_at[shard]
+                    start(shard)
+            if now >= report_at:
+                combined = sum(map(Counter, snapshots.values()), Counter())
+                print(f'Fetcher Stats [{len(snapshots)}/{processes}]: '
+                      f'{format_stats(combined)}, '
+                      f'restarts={sum(restarts.values())}')
+                report_at = now + settings.FEED_STATS_INTERVAL
+    finally:
+        for child in children.values():
+            child.terminate()
+        for child in children.values():
+            child.join()
 
 
 if __name__ == '__main__':
-    import sys
     import os
     assert sys.version_info >= (3, 7), "Script requires Python 3.7+."
     os.environ.setdefault('DJANGO_SETTINGS_MODULE',
@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from feed_fetcher.benchmarks import benchmark_parser, DOCUMENT_FORMATS
+from feed_fetcher.helpers import get_available_engines
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Feed Parser On Generated And Recorded Documents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--items', type=int, nargs='+', default=[10, 1000, 10000, 100000],
+            help='Items per generated document')
+        parser.add_argument(
+            '--formats', nargs='+', default=list(DOCUMENT_FORMATS),
+            choices=DOCUMENT_FORMATS, help='Document formats')
+        parser.add_argument(
+            '--no-fixtures', action='store_true',
+            help='Only benchmark generated documents')
+        parser.add_argument(
+            '--description-size', type=int, default=2000,
+            help='Characters of every item description')
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Timed runs per document')
+        parser.add_argument(
+            '--engines', nargs='+', default=get_available_engines(),
+            choices=get_available_engines(), help='Parser engines')
+        parser.add_argument(
+            '--output', help='Write JSON report to the file')
+
+    def handle(self, *args, **options):
+        """
+
+        :param args:
+        :param options:
+        :return:
+        """
+
+        if options['repeat'] < 1 or min(options['items']) < 1:
+            raise CommandError('--items and --repeat must be positive numbers')
+        report = benchmark_parser(options['items'], options['formats'],
+                                  options['description_size'],
+                                  options['repeat'], options['engines'],
+                                  not options['no_fixtures'])
+        for res in report['results']:
+            document = res.get('fixture', res['format'])
+            self.stdout.write(
+                f"{res['engine']} {document} {res['items']} items: "
+                f"{res['items_per_second']:.0f} items/s, "
+                f"{res['mb_per_second']:.1f} MB/s, "
+                f"peak {res['peak_memory'] / 1048576:.1f} MB, "
+                f"{res['allocations_per_item']:.1f} allocations/item")
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
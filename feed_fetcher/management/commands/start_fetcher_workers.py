@@ -1,12 +1,14 @@
 from django.core.management.base import BaseCommand, CommandError
-from feed_fetcher.main import main
+from feed_fetcher.main import main, supervise
 
 
 class Command(BaseCommand):
     help = 'Start Async Workers'
 
     def add_arguments(self, parser):
-        pass
+        parser.add_argument(
+            '--processes', type=int, default=1,
+            help='Number of event loop processes sharing the feeds')
 
     def handle(self, *args, **options):
         """
@@ -16,7 +18,13 @@ class Command(BaseCommand):
         :return:
         """
 
+        processes = options['processes']
+        if processes < 1:
+            raise CommandError('--processes must be a positive number')
         try:
-            main()
+            if processes > 1:
+                supervise(processes)
+            else:
+                main()
         except Exception as e:
             raise CommandError(f'{e}')
@@ -0,0 +1,97 @@
+# Parsed feed fields stored in feed with their column types. Explicit
+# varchar casts truncate values longer than the column.
+FEED_FIELDS = (
+    ('title', 'varchar(200)'),
+    ('description', 'text'),
+    ('ttl', 'integer'),
+    ('language', 'varchar(20)'),
+    ('last_build_date', 'timestamptz'),
+    ('copyright', 'varchar(200)'),
+    ('image', 'varchar(200)'),
+    ('docs', 'varchar(200)'),
+    ('web_master', 'varchar(100)'),
+    ('pub_date', 'timestamptz'),
+)
+
+# Parsed item fields stored in entry with their column types, in order
+FEED_ITEM_FIELDS = (
+    ('title', 'varchar(200)'),
+    ('description', 'text'),
+    ('link', 'varchar(200)'),
+    ('category', 'varchar(100)[]'),
+    ('guid', 'varchar(200)'),
+    ('pub_date', 'timestamptz'),
+    ('author', 'varchar(100)'),
+    ('creator', 'varchar(100)'),
+    ('rights', 'varchar(200)'),
+    ('enclosure', 'varchar(500)'),
+    ('related_links', 'varchar(200)[]'),
+)
+
+
+class Record:
+    """
+    Fixed set of fields stored in slots
+
+    Fields missing from the constructor arguments are None. Iterating a
+    record yields its values in the order of the fields.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.pop(name, None))
+        if kwargs:
+            raise TypeError(f'Unknown {type(self).__name__} fields: '
+                            f'{", ".join(kwargs)}')
+
+    def __iter__(self):
+        for name in self.__slots__:
+            yield getattr(self, name)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __repr__(self):
+        values = ', '.join(f'{name}={value!r}' for name, value in
+                           zip(self.__slots__, self))
+        return f'{type(self).__name__}({values})'
+
+
+class FeedEntry(Record):
+    """
+    Parsed feed item, fields are in entry column order
+    """
+
+    __slots__ = tuple(name for name, _ in FEED_ITEM_FIELDS)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.category is None:
+            self.category = list()
+
+
+class FeedMeta(Record):
+    """
+    Parsed feed meta data together with its items
+    """
+
+    __slots__ = tuple(name for name, _ in FEED_FIELDS) + ('link', 'items')
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        if self.items is None:
+            self.items = list()
+
+    def columns(self):
+        """
+        Returns feed columns which have been parsed
+
+        :return: List of (column, type, value)
+        """
+        return [(name, pg_type, getattr(self, name))
+                for name, pg_type in FEED_FIELDS
+                if getattr(self, name) is not None]
@@ -0,0 +1,130 @@
+import asyncio
+import heapq
+
+
+class Scheduler:
+    """
+    In-memory min-heap of feed scan times
+
+    Rescheduled and discarded feeds leave stale entries in the heap, those
+    are dropped lazily once they reach the top of it. Urls being fetched are
+    tracked separately, their feeds are rescheduled once the fetch completes.
+    A scheduler only handles feeds of its shard when several fetcher
+    processes run side by side.
+    """
+
+    def __init__(self, shard=0, shards=1):
+        self.shard = shard
+        self.shards = shards
+        self.heap = list()
+        self.deadlines = dict()
+        self.in_flight = set()
+        self.changed = set()
+        self.wakeup = asyncio.Event()
+
+    def __len__(self):
+        return len(self.deadlines)
+
+    def __contains__(self, feed_id):
+        return feed_id in self.deadlines
+
+    def clear(self):
+        self.heap.clear()
+        self.deadlines.clear()
+
+    def schedule(self, feed_id, when):
+        """
+        Sets next scan time of the feed
+
+        :param feed_id: Feed ID
+        :param when: Next scan datetime
+        :return: None
+        """
+        if self.deadlines.get(feed_id) == when:
+            return
+        self.deadlines[feed_id] = when
+        heapq.heappush(self.heap, (when, feed_id))
+        if len(self.heap) > 2 * len(self.deadlines) + 64:
+            self.heap = [(when, feed_id)
+                         for feed_id, when in self.deadlines.items()]
+            heapq.heapify(self.heap)
+
+    def discard(self, feed_id):
+        """
+        Removes feed from the schedule
+
+        :param feed_id: Feed ID
+        :return: None
+        """
+        self.deadlines.pop(feed_id, None)
+
+    def _prune(self):
+        while self.heap:
+            when, feed_id = self.heap[0]
+            if self.deadlines.get(feed_id) == when:
+                return
+            heapq.heappop(self.heap)
+
+    def next_deadline(self):
+        """
+        Returns the earliest scan time
+
+        :return: Datetime or None when nothing is scheduled
+        """
+        self._prune()
+        if self.heap:
+            return self.heap[0][0]
+        return None
+
+    def pop_due(self, now) -> list:
+        """
+        Removes and returns feeds due at the given time
+
+        :param now: Current datetime
+        :return: List of Feed IDs
+        """
+        due = list()
+        self._prune()
+        while self.heap and self.heap[0][0] <= now:
+            when, feed_id = heapq.heappop(self.heap)
+            del self.deadlines[feed_id]
+            due.append(feed_id)
+            self._prune()
+        return due
+
+    def notify(self, feed_id):
+        """
+        Marks feed as changed outside of the fetcher
+
+        :param feed_id: Feed ID
+        :return: None
+        """
+        self.changed.add(feed_id)
+        self.wakeup.set()
+
+    def complete(self, url, feeds):
+        """
+        Reschedules feeds of the url which has been fetched
+
+        :param url: Fetched url
+        :param feeds: List of (Feed ID, next scan datetime, terminated)
+        :return: None
+        """
+        self.in_flight.discard(url)
+        for feed_id, when, terminated in feeds:
+            if not terminated:
+                self.schedule(feed_id, when)
+        self.wakeup.set()
+
+    async def wait(self, timeout):
+        """
+        Sleeps until timeout, feed change or completed fetch
+
+        :param timeout: Seconds
+        :return: None
+        """
+        try:
+            await asyncio.wait_for(self.wakeup.wait(), max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+        self.wakeup.clear()
@@ -0,0 +1,85 @@
+import re
+import weakref
+import contextlib
+
+from feed_fetcher import stats
+
+# Names of statements prepared on every connection
+_prepared = weakref.WeakKeyDictionary()
+
+
+def param_type(pg_type) -> str:
+    """
+    Returns parameter type of a column type
+
+    Type modifiers of parameters are ignored by Postgres, values are cast in
+    the statement instead.
+
+    :param pg_type: Column type e.g. varchar(200)[]
+    :return: Parameter type e.g. varchar[]
+    """
+    return re.sub(r'\(\d+\)', '', pg_type)
+
+
+class Statement:
+    """
+    Server side prepared statement
+
+    Statement is prepared on a connection the first time it is executed
+    there, later executions only send its name and parameter values, so
+    Postgres neither parses nor plans it again. Query refers to the
+    parameters as $1, $2, ...
+    """
+
+    def __init__(self, name, arg_types, query):
+        self.name = name
+        self.arg_types = tuple(arg_types)
+        self.query = query
+
+    def __repr__(self):
+        return f'Statement({self.name})'
+
+    async def execute(self, cur, params):
+        """
+        Executes statement, preparing it first if needed
+
+        :param cur: DB Cursor
+        :param params: Parameter values in order
+        :return: None
+        """
+        prepared = _prepared.setdefault(cur.connection, set())
+        if self.name not in prepared:
+            await cur.execute(f'PREPARE {self.name} '
+                              f'({", ".join(self.arg_types)}) '
+                              f'AS {self.query}')
+            prepared.add(self.name)
+            stats.incr('statements_prepared')
+        placeholders = ', '.join(['%s'] * len(self.arg_types))
+        await cur.execute(f'EXECUTE {self.name} ({placeholders})',
+                          list(params))
+
+
+@contextlib.asynccontextmanager
+async def transaction(conn):
+    """
+    Runs statements executed on the yielded cursor in a single transaction
+
+    Connections are in autocommit mode, so without a transaction every
+    statement is committed, and flushed to WAL, on its own. Transaction is
+    committed when the block completes and rolled back when it raises.
+    aiopg allows one cursor per connection, opening another one closes the
+    cursor of the transaction, so statements of the block must use it.
+
+    :param conn: DB connection
+    :return: DB cursor
+    """
+    async with conn.cursor() as cur:
+        await cur.execute('BEGIN')
+        try:
+            yield cur
+        except BaseException:
+            await cur.execute('ROLLBACK')
+            stats.incr('rollbacks')
+            raise
+        await cur.execute('COMMIT')
+        stats.incr('commits')
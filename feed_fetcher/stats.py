@@ -0,0 +1,72 @@
+import asyncio
+from collections import Counter
+
+counters = Counter()
+
+
+def incr(name: str, value: int = 1):
+    """
+    Increments process wide fetcher counter
+
+    :param name: Counter name
+    :param value: Increment
+    :return: None
+    """
+    counters[name] += value
+
+
+def observe(name: str, seconds: float):
+    """
+    Records duration of an operation
+
+    Durations are kept as count and total microseconds counters, so they can
+    be summed up over processes like any other counter.
+
+    :param name: Operation name
+    :param seconds: Duration
+    :return: None
+    """
+    counters[f'{name}_count'] += 1
+    counters[f'{name}_us'] += int(seconds * 1000000)
+
+
+def peak(name: str, value: int):
+    """
+    Records the highest value of a gauge
+
+    :param name: Gauge name
+    :param value: Current value
+    :return: None
+    """
+    name = f'{name}_peak'
+    counters[name] = max(counters[name], value)
+
+
+def format_stats(snapshot) -> str:
+    """
+    Formats counters snapshot as a single log line
+
+    :param snapshot: Mapping of counter name to value
+    :return: Log line
+    """
+    return ', '.join(f'{key}={snapshot[key]}' for key in sorted(snapshot))
+
+
+async def report_stats(interval, status=None, shard=0):
+    """
+    Periodically prints fetcher counters
+
+    When running as one of several fetcher processes the counters are sent
+    to the supervising process instead, which prints them combined.
+
+    :param interval: Seconds between reports
+    :param status: Supervisor queue
+    :param shard: Index of the fetcher process
+    :return: None
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if status is not None:
+            status.put((shard, dict(counters)))
+        else:
+            print(f'Fetcher Stats: {format_stats(counters)}')
@@ -0,0 +1,34 @@
+import json
+
+import asynctest
+
+from feed_fetcher.benchmarks import generate_document, benchmark_parser, \
+    DOCUMENT_FORMATS, FIXTURE_DOCUMENTS
+from feed_fetcher.helpers import parse_feed
+
+
+class BenchmarksTestCase(asynctest.TestCase):
+    def test_generated_documents_parse_completely(self):
+        for document_format in DOCUMENT_FORMATS:
+            document = generate_document(document_format, 25, 100)
+            res = parse_feed(document, 'feeds.feedburner.com')
+            self.assertEqual(len(res.items), 25)
+            self.assertTrue(res.items[0].category)
+
+    def test_report_is_json_serializable(self):
+        report = benchmark_parser((5,), ('rss', 'atom'), 100, 1, ['etree'],
+                                  False)
+        self.assertEqual(len(report['results']), 2)
+        res = report['results'][0]
+        self.assertEqual((res['format'], res['items']), ('rss', 5))
+        self.assertGreater(res['peak_memory'], 0)
+        self.assertEqual(json.loads(json.dumps(report)), report)
+
+    def test_recorded_documents_are_benchmarked(self):
+        report = benchmark_parser((5,), DOCUMENT_FORMATS, 100, 1, ['etree'])
+        recorded = [res for res in report['results'] if 'fixture' in res]
+        self.assertEqual([(res['fixture'], res['format']) for res in recorded],
+                         [(name, document_format)
+                          for name, document_format, _ in FIXTURE_DOCUMENTS])
+        for res in recorded:
+            self.assertEqual(res['items'], 3)
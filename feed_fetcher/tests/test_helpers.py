@@ -1,7 +1,27 @@
 import os
+import pickle
+import random
+import datetime
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
 import asynctest
+from django.core.exceptions import ImproperlyConfigured
+
+from feed_fetcher import stats
+from feed_fetcher.helpers import get_feed_as_dict, push_to_db, parse_feed, \
+    FeedParser, get_dispatch_tables, parse_date, get_parser_engine, \
+    lxml_etree, FeedParseError, get_available_engines
+from feed_fetcher.records import FeedMeta
+from feed_fetcher.benchmarks import read_fixture_dates, strptime_date
+from feed_fetcher.tests.utils import get_cursor
 
-from feed_fetcher.helpers import get_feed_as_dict
+
+def read_fixture(name):
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'data', name)
+    with open(file_path, 'r') as f:
+        return f.read()
 
 
 class XMLFeedParserTestCase(asynctest.TestCase):
@@ -11,11 +31,11 @@ class XMLFeedParserTestCase(asynctest.TestCase):
         service_name = 'www.nu.nl'
         with open(file_path, 'r') as f:
             res = await get_feed_as_dict(f.read(), service_name)
-            self.assertTrue(isinstance(res, dict))
-            self.assertEqual(len(res['items']), 3)
-            self.assertEqual(res['ttl'], 60)
-            self.assertEqual(res['link'], 'https://www.nu.nl/algemeen')
-            self.assertEqual(res['title'], 'NU - Algemeen')
+            self.assertTrue(isinstance(res, FeedMeta))
+            self.assertEqual(len(res.items), 3)
+            self.assertEqual(res.ttl, 60)
+            self.assertEqual(res.link, 'https://www.nu.nl/algemeen')
+            self.assertEqual(res.title, 'NU - Algemeen')
 
     async def test_feedburner_xml_parses_successfully(self):
         file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
@@ -23,7 +43,380 @@ class XMLFeedParserTestCase(asynctest.TestCase):
         service_name = 'feeds.feedburner.com'
         with open(file_path, 'r') as f:
             res = await get_feed_as_dict(f.read(), service_name)
-            self.assertTrue(isinstance(res, dict))
-            self.assertEqual(len(res['items']), 3)
-            self.assertEqual(res['link'], 'https://tweakers.net/')
-            self.assertEqual(res['title'], 'Tweakers Mixed RSS Feed')
+            self.assertTrue(isinstance(res, FeedMeta))
+            self.assertEqual(len(res.items), 3)
+            self.assertEqual(res.link, 'https://tweakers.net/')
+            self.assertEqual(res.title, 'Tweakers Mixed RSS Feed')
+
+
+SOURCE = 'https://www.nu.nl/rss/Algemeen'
+
+
+class PushToDBTestCase(asynctest.TestCase):
+    async def setUp(self):
+        file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'data/algemeen.xml')
+        with open(file_path, 'r') as f:
+            self.feed_dict = await get_feed_as_dict(f.read(), 'www.nu.nl')
+        self.cur = get_cursor([])
+        self.cur.rowcount = 2
+
+    async def test_items_are_inserted_in_single_statement(self):
+        inserted = await push_to_db(SOURCE, [(1, 7), (2, 8)],
+                                    self.feed_dict, self.cur)
+        self.assertEqual(inserted, 2)
+        self.assertEqual(self.cur.execute.await_count, 4)
+        query = self.cur.execute.await_args_list[0][0][0]
+        self.assertTrue(query.startswith('PREPARE update_feeds'))
+        self.assertNotIn('link', query)
+        query, params = self.cur.execute.await_args_list[1][0]
+        self.assertTrue(query.startswith('EXECUTE update_feeds'))
+        self.assertEqual(params[0], 'NU - Algemeen')
+        self.assertEqual(params[-1], [1, 2])
+        query = self.cur.execute.await_args_list[2][0][0]
+        self.assertTrue(query.startswith('PREPARE insert_entries_3'))
+        self.assertIn('INSERT INTO entry (source, ', query)
+        self.assertIn('ON CONFLICT (source, guid) DO NOTHING', query)
+        self.assertIn("entry.create_date > now() - interval '12 months'",
+                      query)
+        self.assertTrue(query.endswith(
+            'WHERE f.entry_id = e.id AND f.user_id = s.user_id)'))
+        self.assertEqual(query.count('), ('), 2)
+        query, params = self.cur.execute.await_args_list[3][0]
+        self.assertTrue(query.startswith('EXECUTE insert_entries_3'))
+        self.assertEqual(len(params), 3 * 11 + 3)
+        self.assertEqual(params[-3:], [SOURCE, [1, 2], [7, 8]])
+        self.assertEqual(params[3], ['Algemeen', 'Binnenland'])
+        self.assertEqual(len(params[10]), 3)
+        self.assertEqual(params[10][0][1], 'Nederlanders schaffen weer '
+                                           'meer vuurwerk in voorverkoop aan')
+
+    async def test_unchanged_meta_data_is_not_written(self):
+        stats.counters.clear()
+        self.cur.rowcount = 1
+        await push_to_db(SOURCE, [(1, 7), (2, 8), (3, 9)], self.feed_dict,
+                         self.cur, items=False)
+        query = self.cur.execute.await_args_list[0][0][0]
+        self.assertIn('AND (title, description, ttl, ', query)
+        self.assertIn(
+            ') IS DISTINCT FROM (COALESCE($1::varchar(200), title), ', query)
+        self.assertEqual(stats.counters['feed_meta_writes'], 1)
+        self.assertEqual(stats.counters['feed_meta_writes_avoided'], 2)
+
+    async def test_items_are_skipped_when_ingested_by_buffer(self):
+        inserted = await push_to_db(SOURCE, [(1, 7)], self.feed_dict,
+                                    self.cur, items=False)
+        self.assertEqual(inserted, 0)
+        queries = [args[0][0] for args in self.cur.execute.await_args_list]
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(queries[1].startswith('EXECUTE update_feeds'))
+
+    async def test_statements_are_prepared_once_per_connection(self):
+        await push_to_db(SOURCE, [(1, 7)], self.feed_dict, self.cur)
+        await push_to_db(SOURCE, [(1, 7)], self.feed_dict, self.cur)
+        queries = [args[0][0] for args in self.cur.execute.await_args_list]
+        self.assertEqual(len(queries), 6)
+        self.assertEqual(
+            len([query for query in queries if query.startswith('PREPARE')]),
+            2)
+
+    @asynctest.patch('feed_fetcher.helpers.ITEM_BATCH_SIZE', 2)
+    async def test_items_are_inserted_in_batches(self):
+        inserted = await push_to_db(SOURCE, [(1, 7)], self.feed_dict,
+                                    self.cur)
+        self.assertEqual(inserted, 4)
+        queries = [args[0][0] for args in self.cur.execute.await_args_list]
+        self.assertTrue(queries[3].startswith('EXECUTE insert_entries_2'))
+        self.assertTrue(queries[5].startswith('EXECUTE insert_entries_1'))
+
+
+class ParserExecutorTestCase(asynctest.TestCase):
+    def setUp(self):
+        stats.counters.clear()
+        self.executor = ThreadPoolExecutor(1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_parsed_feed_is_picklable(self):
+        res = parse_feed(read_fixture('algemeen.xml'), 'www.nu.nl')
+        self.assertEqual(pickle.loads(pickle.dumps(res)), res)
+
+    @asynctest.patch('feed_fetcher.helpers.get_parser_executor')
+    async def test_feed_is_parsed_in_executor(self, mock_get_executor):
+        mock_get_executor.return_value = self.executor
+        res = await get_feed_as_dict(read_fixture('algemeen.xml'),
+                                     'www.nu.nl')
+        self.assertEqual(len(res.items), 3)
+        self.assertEqual(stats.counters['parse_count'], 1)
+        self.assertEqual(stats.counters['parse_wait_count'], 1)
+
+    @asynctest.patch('feed_fetcher.helpers.get_parser_executor')
+    async def test_feed_is_parsed_on_loop_without_executor(
+            self, mock_get_executor):
+        mock_get_executor.return_value = None
+        res = await get_feed_as_dict(read_fixture('algemeen.xml'),
+                                     'www.nu.nl')
+        self.assertEqual(len(res.items), 3)
+        self.assertEqual(stats.counters['parse_count'], 1)
+        self.assertEqual(stats.counters['parse_wait_count'], 0)
+
+
+class FeedParserTestCase(asynctest.TestCase):
+    def test_chunked_document_parses_same_as_whole(self):
+        text = read_fixture('feedburner_tweakers_mixed.xml')
+        parser = FeedParser('feeds.feedburner.com')
+        body = text.encode()
+        for idx in range(0, len(body), 100):
+            parser.feed(body[idx:idx + 100])
+        self.assertEqual(parser.close(),
+                         parse_feed(text, 'feeds.feedburner.com'))
+
+    def test_parsed_items_are_released(self):
+        text = read_fixture('algemeen.xml')
+        parser = FeedParser('www.nu.nl')
+        parser.feed(text[:text.index('</channel>')])
+        channel = parser.stack[1]
+        self.assertEqual(len(parser.res.items), 3)
+        # Last converted element is cleared, it's deleted with the next one
+        self.assertEqual(len(channel), 1)
+        self.assertEqual(len(channel[0]), 0)
+
+
+ATOM_FEED = '''<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+    <title>Example Atom Feed</title>
+    <subtitle>Atom feed description</subtitle>
+    <link href="https://example.org/"/>
+    <link rel="self" href="https://example.org/feed.atom"/>
+    <updated>2019-12-28T13:44:53Z</updated>
+    <entry>
+        <title>First entry</title>
+        <link href="https://example.org/1"/>
+        <link rel="related" title="Related" href="https://example.org/r"/>
+        <id>urn:uuid:1</id>
+        <published>2019-12-28T11:00:00+01:00</published>
+        <summary>Entry summary</summary>
+        <author><name>Jane Doe</name></author>
+        <category term="News"/>
+    </entry>
+    <entry>
+        <title>Entry without date</title>
+        <link href="https://example.org/2"/>
+    </entry>
+</feed>
+'''
+
+RDF_FEED = '''<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns="http://purl.org/rss/1.0/"
+         xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <channel rdf:about="https://example.org/">
+        <title>Example RDF Feed</title>
+        <link>https://example.org/</link>
+        <description>RDF feed description</description>
+        <dc:language>en</dc:language>
+    </channel>
+    <image rdf:about="https://example.org/logo.png">
+        <url>https://example.org/logo.png</url>
+    </image>
+    <item rdf:about="https://example.org/1">
+        <title>First item</title>
+        <link>https://example.org/1</link>
+        <dc:date>2019-12-28T11:00:00Z</dc:date>
+        <dc:subject>News</dc:subject>
+        <dc:creator>John Doe</dc:creator>
+    </item>
+</rdf:RDF>
+'''
+
+NESTED_NAMESPACE_FEED = '''<?xml version="1.0"?>
+<rss version="2.0">
+    <channel xmlns:dc="http://purl.org/dc/elements/1.1/">
+        <title>Example RSS Feed</title>
+        <item>
+            <title>First item</title>
+            <link>https://example.org/1</link>
+            <guid>https://example.org/1</guid>
+            <dc:date>2019-12-28T11:00:00Z</dc:date>
+            <dc:creator>John Doe</dc:creator>
+        </item>
+    </channel>
+</rss>
+'''
+
+
+class FeedFormatsTestCase(asynctest.TestCase):
+    def test_atom_feed_parses_successfully(self):
+        res = parse_feed(ATOM_FEED, 'example.org')
+        self.assertEqual(res.title, 'Example Atom Feed')
+        self.assertEqual(res.link, 'https://example.org/')
+        self.assertEqual(res.description, 'Atom feed description')
+        self.assertEqual(res.last_build_date.year, 2019)
+        self.assertEqual(len(res.items), 2)
+        item = res.items[0]
+        self.assertEqual(item.guid, 'urn:uuid:1')
+        self.assertEqual(item.link, 'https://example.org/1')
+        self.assertEqual(item.author, 'Jane Doe')
+        self.assertEqual(item.category, ['News'])
+        self.assertEqual(item.related_links,
+                         [['https://example.org/r', 'Related']])
+        self.assertEqual(item.pub_date.utcoffset().total_seconds(), 3600)
+
+    def test_rdf_feed_parses_successfully(self):
+        res = parse_feed(RDF_FEED, 'example.org')
+        self.assertEqual(res.title, 'Example RDF Feed')
+        self.assertEqual(res.language, 'en')
+        self.assertEqual(res.image, 'https://example.org/logo.png')
+        self.assertEqual(len(res.items), 1)
+        item = res.items[0]
+        self.assertEqual(item.guid, 'https://example.org/1')
+        self.assertEqual(item.creator, 'John Doe')
+        self.assertEqual(item.category, ['News'])
+        self.assertEqual(item.description, '')
+
+    def test_namespaces_declared_below_root_are_parsed(self):
+        res = parse_feed(NESTED_NAMESPACE_FEED, 'example.org')
+        self.assertEqual(len(res.items), 1)
+        self.assertEqual(res.items[0].creator, 'John Doe')
+        self.assertEqual(res.items[0].pub_date,
+                         datetime.datetime(2019, 12, 28, 11,
+                                           tzinfo=datetime.timezone.utc))
+
+    def test_items_without_date_are_dated_by_fetch(self):
+        fetch_date = datetime.datetime(2020, 1, 2,
+                                       tzinfo=datetime.timezone.utc)
+        res = parse_feed(ATOM_FEED, 'example.org', fetch_date=fetch_date)
+        self.assertEqual(res.items[1].title, 'Entry without date')
+        self.assertEqual(res.items[1].guid, 'https://example.org/2')
+        self.assertEqual(res.items[1].pub_date, fetch_date)
+        self.assertNotEqual(res.items[0].pub_date, fetch_date)
+
+    def test_feed_of_any_host_parses(self):
+        res = parse_feed(read_fixture('algemeen.xml'), 'example.org')
+        self.assertEqual(len(res.items), 3)
+        self.assertEqual(res.items[0].category,
+                         ['Algemeen', 'Binnenland'])
+
+    def test_unknown_document_parses_empty(self):
+        self.assertEqual(parse_feed('<html><body/></html>', 'example.org'),
+                         FeedMeta())
+
+    def test_malformed_document_raises_parse_error(self):
+        for text in ('<html><body></html>', ATOM_FEED[:300], 'Not found'):
+            with self.assertRaises(FeedParseError) as ctx:
+                parse_feed(text, 'example.org')
+            error = pickle.loads(pickle.dumps(ctx.exception))
+            self.assertEqual(str(error), str(ctx.exception))
+
+    def test_dispatch_tables_are_cached(self):
+        get_dispatch_tables.cache_clear()
+        parse_feed(ATOM_FEED, 'example.org')
+        parse_feed(ATOM_FEED, 'example.com')
+        info = get_dispatch_tables.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+
+
+class DateParserTestCase(asynctest.TestCase):
+    def test_rfc822_dates_parse(self):
+        self.assertEqual(parse_date('Sat, 28 Dec 2019 13:44:53 +0100'),
+                         datetime.datetime(2019, 12, 28, 12, 44, 53,
+                                           tzinfo=datetime.timezone.utc))
+        self.assertEqual(parse_date('28 Dec 19 07:44 EST'),
+                         datetime.datetime(2019, 12, 28, 12, 44,
+                                           tzinfo=datetime.timezone.utc))
+        self.assertEqual(
+            parse_date('Saturday, 28 December 2019 12:44:53 GMT'),
+            datetime.datetime(2019, 12, 28, 12, 44, 53,
+                              tzinfo=datetime.timezone.utc))
+
+    def test_iso8601_dates_parse(self):
+        self.assertEqual(parse_date('2019-12-28T13:44:53.5+01:00'),
+                         datetime.datetime(2019, 12, 28, 12, 44, 53, 500000,
+                                           tzinfo=datetime.timezone.utc))
+        self.assertEqual(parse_date('2019-12-28T12:44:53Z'),
+                         datetime.datetime(2019, 12, 28, 12, 44, 53,
+                                           tzinfo=datetime.timezone.utc))
+        self.assertEqual(parse_date('2019-12-28'),
+                         datetime.datetime(2019, 12, 28,
+                                           tzinfo=datetime.timezone.utc))
+
+    def test_unknown_zone_is_taken_for_utc(self):
+        self.assertEqual(parse_date('Sat, 28 Dec 2019 12:44:53 XYZ'),
+                         datetime.datetime(2019, 12, 28, 12, 44, 53,
+                                           tzinfo=datetime.timezone.utc))
+
+    def test_invalid_dates_parse_to_none(self):
+        self.assertIsNone(parse_date('Sat, 31 Feb 2019 12:00:00 GMT'))
+        self.assertIsNone(parse_date('yesterday'))
+        self.assertIsNone(parse_date(None))
+
+    def test_fixture_dates_match_strptime(self):
+        for value in read_fixture_dates():
+            expected = strptime_date(value)
+            if expected.tzinfo is None:
+                expected = expected.replace(tzinfo=datetime.timezone.utc)
+            self.assertEqual(parse_date(value), expected)
+
+
+class ParserEngineTestCase(asynctest.TestCase):
+    @unittest.skipIf(lxml_etree is None, 'lxml is not installed')
+    def test_engines_parse_documents_identically(self):
+        documents = [
+            (read_fixture('algemeen.xml'), 'www.nu.nl'),
+            (read_fixture('feedburner_tweakers_mixed.xml'),
+             'feeds.feedburner.com'),
+            (ATOM_FEED, 'example.org'),
+            (RDF_FEED, 'example.org'),
+        ]
+        fetch_date = datetime.datetime.now(datetime.timezone.utc)
+        for text, service_name in documents:
+            for document in (text, text.encode()):
+                res = parse_feed(document, service_name, 'etree',
+                                 fetch_date)
+                self.assertEqual(parse_feed(document, service_name, 'lxml',
+                                            fetch_date), res)
+            self.assertTrue(res.items)
+
+    @unittest.skipIf(lxml_etree is None, 'lxml is not installed')
+    def test_engines_parse_chunked_documents_identically(self):
+        body = read_fixture('feedburner_tweakers_mixed.xml').encode()
+        results = list()
+        for engine in ('etree', 'lxml'):
+            parser = FeedParser('feeds.feedburner.com', engine)
+            for idx in range(0, len(body), 100):
+                parser.feed(body[idx:idx + 100])
+            results.append(parser.close())
+        self.assertEqual(results[0], results[1])
+
+    @unittest.skipIf(lxml_etree is None, 'lxml is not installed')
+    def test_engines_raise_same_parse_error(self):
+        for engine in ('etree', 'lxml'):
+            with self.assertRaises(FeedParseError):
+                parse_feed(ATOM_FEED[:300], 'example.org', engine)
+
+    def test_documents_parse_same_in_network_sized_chunks(self):
+        chunk_sizes = random.Random(7)
+        fetch_date = datetime.datetime.now(datetime.timezone.utc)
+        for name, service_name in (('algemeen.xml', 'www.nu.nl'),
+                                   ('feedburner_tweakers_mixed.xml',
+                                    'feeds.feedburner.com')):
+            body = read_fixture(name).encode()
+            for engine in get_available_engines():
+                expected = parse_feed(body, service_name, engine,
+                                      fetch_date)
+                parser = FeedParser(service_name, engine, fetch_date)
+                idx = 0
+                while idx < len(body):
+                    size = chunk_sizes.randint(200, 4000)
+                    parser.feed(body[idx:idx + size])
+                    idx += size
+                self.assertEqual(parser.close(), expected)
+
+    @asynctest.patch('feed_fetcher.helpers.lxml_etree', None)
+    def test_lxml_engine_falls_back_to_etree(self):
+        self.assertEqual(get_parser_engine('lxml').name, 'etree')
+
+    def test_unknown_engine_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            get_parser_engine('sax')
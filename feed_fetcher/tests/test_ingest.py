@@ -0,0 +1,120 @@
+import asyncio
+import datetime
+
+import asynctest
+
+from feed_fetcher import stats
+from feed_fetcher.ingest import IngestBuffer, copy_rows, copy_value, \
+    get_merge_query, CREATE_STAGING
+from feed_fetcher.records import FeedEntry
+
+
+SOURCE = 'https://www.nu.nl/rss/Algemeen'
+
+
+class Writer:
+    def __init__(self):
+        self.writes = list()
+        self.closed = False
+
+    def write(self, rows, validators):
+        self.writes.append((rows, validators))
+        return len(rows)
+
+    def close(self):
+        self.closed = True
+
+
+def get_entries(count):
+    return [FeedEntry(title=f'Item {idx}', guid=f'guid-{idx}')
+            for idx in range(count)]
+
+
+class CopyFormatTestCase(asynctest.TestCase):
+    def test_values_are_escaped(self):
+        self.assertEqual(copy_value(None), '\\N')
+        self.assertEqual(copy_value(5), '5')
+        self.assertEqual(copy_value('a\tb\nc\\d'), 'a\\tb\\nc\\\\d')
+        self.assertEqual(
+            copy_value(datetime.datetime(2019, 12, 28, 13, 44, 53,
+                                         tzinfo=datetime.timezone.utc)),
+            '2019-12-28T13:44:53+00:00')
+
+    def test_lists_are_formatted_as_arrays(self):
+        self.assertEqual(copy_value([]), '{}')
+        self.assertEqual(copy_value(['Algemeen', 'Say "hi"']),
+                         '{"Algemeen","Say \\\\"hi\\\\""}')
+        self.assertEqual(copy_value([['https://nu.nl', 'Nu']]),
+                         '{{"https://nu.nl","Nu"}}')
+
+    def test_rows_are_tab_separated_lines(self):
+        self.assertEqual(copy_rows([('a', None, 1), ('b', [], 2)]),
+                         'a\t\\N\t1\nb\t{}\t2\n')
+
+    def test_staging_values_are_truncated_when_merged(self):
+        query = get_merge_query()
+        self.assertIn('title varchar,', CREATE_STAGING)
+        self.assertIn('title::varchar(200)', query)
+        self.assertIn('ON CONFLICT (source, guid) DO NOTHING', query)
+        self.assertIn("entry.create_date > now() - interval '12 months'",
+                      query)
+        self.assertTrue(query.endswith(
+            'WHERE f.entry_id = e.id AND f.user_id = u.user_id)'))
+
+
+class IngestBufferTestCase(asynctest.TestCase):
+    def setUp(self):
+        stats.counters.clear()
+        self.writer = Writer()
+        self.buffer = IngestBuffer(self.writer, flush_rows=4,
+                                   flush_interval=0.05, max_rows=6)
+
+    async def test_items_are_buffered_with_subscribers(self):
+        await self.buffer.put(SOURCE, [(1, 7), (2, 8)], get_entries(2),
+                              ('"abc"', None, 'digest'))
+        self.assertEqual(len(self.buffer), 2)
+        self.assertEqual(self.buffer.rows[1][-3:], (SOURCE, [1, 2], [7, 8]))
+        await self.buffer.flush()
+        rows, validators = self.writer.writes[0]
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(validators, [(1, '"abc"', None, 'digest'),
+                                      (2, '"abc"', None, 'digest')])
+        self.assertEqual(stats.counters['items_inserted'], 2)
+        self.assertEqual(len(self.buffer), 0)
+
+    async def test_full_batch_is_flushed(self):
+        task = asyncio.ensure_future(self.buffer.run())
+        await self.buffer.put(SOURCE, [(1, 7)], get_entries(4))
+        await asyncio.sleep(0.01)
+        self.assertEqual(len(self.writer.writes), 1)
+        self.buffer.closed = True
+        await task
+
+    async def test_partial_batch_is_flushed_after_interval(self):
+        task = asyncio.ensure_future(self.buffer.run())
+        await self.buffer.put(SOURCE, [(1, 7)], get_entries(1))
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.writer.writes, [])
+        await asyncio.sleep(0.1)
+        self.assertEqual(len(self.writer.writes), 1)
+        self.buffer.closed = True
+        await task
+
+    async def test_workers_wait_while_buffer_is_full(self):
+        await self.buffer.put(SOURCE, [(1, 7)], get_entries(5))
+        put = asyncio.ensure_future(
+            self.buffer.put(SOURCE, [(2, 8)], get_entries(2)))
+        await asyncio.sleep(0.01)
+        self.assertFalse(put.done())
+        self.assertEqual(stats.counters['ingest_waits'], 1)
+        await self.buffer.flush()
+        await put
+        self.assertEqual(len(self.buffer), 2)
+
+    async def test_close_flushes_buffer(self):
+        await self.buffer.put(SOURCE, [(1, 7)], get_entries(1))
+        await self.buffer.close()
+        self.assertEqual(len(self.writer.writes), 1)
+        self.assertTrue(self.writer.closed)
+        with self.assertRaises(RuntimeError):
+            await self.buffer.put(SOURCE, [(1, 7)], get_entries(1))
@@ -0,0 +1,33 @@
+import pickle
+
+import asynctest
+
+from feed_fetcher.records import FEED_ITEM_FIELDS, FeedEntry, FeedMeta
+
+
+class RecordsTestCase(asynctest.TestCase):
+    def test_entry_values_follow_column_order(self):
+        entry = FeedEntry(guid='1', title='Title', link='https://dachi.me')
+        values = dict(zip((key for key, _ in FEED_ITEM_FIELDS), entry))
+        self.assertEqual(len(tuple(entry)), len(FEED_ITEM_FIELDS))
+        self.assertEqual(values['guid'], '1')
+        self.assertEqual(values['title'], 'Title')
+        self.assertEqual(values['category'], [])
+        self.assertIsNone(values['pub_date'])
+
+    def test_records_have_no_instance_dict(self):
+        self.assertFalse(hasattr(FeedEntry(), '__dict__'))
+        self.assertFalse(hasattr(FeedMeta(), '__dict__'))
+
+    def test_unknown_field_is_rejected(self):
+        with self.assertRaises(TypeError):
+            FeedEntry(foo='bar')
+
+    def test_only_parsed_feed_columns_are_returned(self):
+        meta = FeedMeta(title='Title', ttl=60, link='https://dachi.me')
+        self.assertEqual(meta.columns(), [('title', 'varchar(200)', 'Title'),
+                                          ('ttl', 'integer', 60)])
+
+    def test_records_are_picklable(self):
+        meta = FeedMeta(title='Title', items=[FeedEntry(guid='1')])
+        self.assertEqual(pickle.loads(pickle.dumps(meta)), meta)
@@ -0,0 +1,44 @@
+import datetime
+
+import asynctest
+from django.utils import timezone
+
+from feed_fetcher.scheduler import Scheduler
+
+
+class SchedulerTestCase(asynctest.TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.scheduler = Scheduler()
+
+    def at(self, seconds):
+        return self.now + datetime.timedelta(seconds=seconds)
+
+    def test_due_feeds_are_popped_in_order(self):
+        self.scheduler.schedule(1, self.at(10))
+        self.scheduler.schedule(2, self.at(-10))
+        self.scheduler.schedule(3, self.at(-20))
+        self.assertEqual(self.scheduler.pop_due(self.now), [3, 2])
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertEqual(self.scheduler.next_deadline(), self.at(10))
+
+    def test_rescheduled_feed_uses_latest_deadline(self):
+        self.scheduler.schedule(1, self.at(-10))
+        self.scheduler.schedule(1, self.at(10))
+        self.assertEqual(self.scheduler.pop_due(self.now), [])
+        self.assertEqual(self.scheduler.pop_due(self.at(10)), [1])
+
+    def test_discarded_feed_is_never_due(self):
+        self.scheduler.schedule(1, self.at(-10))
+        self.scheduler.discard(1)
+        self.assertIsNone(self.scheduler.next_deadline())
+        self.assertEqual(self.scheduler.pop_due(self.now), [])
+
+    def test_completed_url_is_rescheduled(self):
+        self.scheduler.in_flight.add('https://www.dachi.me/rss/news')
+        self.scheduler.complete('https://www.dachi.me/rss/news',
+                                [(1, self.at(60), False),
+                                 (2, self.at(60), True)])
+        self.assertFalse(self.scheduler.in_flight)
+        self.assertEqual(self.scheduler.deadlines, {1: self.at(60)})
+        self.assertTrue(self.scheduler.wakeup.is_set())
@@ -0,0 +1,62 @@
+import asynctest
+
+from feed_fetcher import stats
+from feed_fetcher.statements import Statement, param_type, transaction
+from feed_fetcher.tests.utils import get_cursor, get_connection
+
+
+class StatementTestCase(asynctest.TestCase):
+    def setUp(self):
+        stats.counters.clear()
+        self.statement = Statement(
+            'select_feed', ('int', 'varchar[]'),
+            "SELECT id FROM feed WHERE id = $1 AND link <> ALL($2) "
+            "AND link LIKE 'https://%'")
+
+    async def test_statement_is_prepared_once_per_connection(self):
+        cur = get_cursor([])
+        await self.statement.execute(cur, (1, ['https://dachi.me']))
+        await self.statement.execute(cur, (2, []))
+        self.assertEqual(cur.execute.await_count, 3)
+        query = cur.execute.await_args_list[0][0][0]
+        self.assertEqual(
+            query, "PREPARE select_feed (int, varchar[]) AS SELECT id FROM "
+                   "feed WHERE id = $1 AND link <> ALL($2) "
+                   "AND link LIKE 'https://%'")
+        self.assertEqual(cur.execute.await_args[0],
+                         ('EXECUTE select_feed (%s, %s)', [2, []]))
+        self.assertEqual(stats.counters['statements_prepared'], 1)
+
+    async def test_statement_is_prepared_on_every_connection(self):
+        await self.statement.execute(get_cursor([]), (1, []))
+        await self.statement.execute(get_cursor([]), (1, []))
+        self.assertEqual(stats.counters['statements_prepared'], 2)
+
+    def test_type_modifiers_are_dropped_from_parameter_types(self):
+        self.assertEqual(param_type('varchar(200)[]'), 'varchar[]')
+        self.assertEqual(param_type('timestamptz'), 'timestamptz')
+
+
+class TransactionTestCase(asynctest.TestCase):
+    def setUp(self):
+        stats.counters.clear()
+        self.cur = get_cursor([])
+        self.conn = get_connection(self.cur)
+
+    def executed(self):
+        return [args[0][0] for args in self.cur.execute.await_args_list]
+
+    async def test_transaction_is_committed(self):
+        async with transaction(self.conn) as cur:
+            await cur.execute('SELECT 1')
+        self.assertIs(cur, self.cur)
+        self.assertEqual(self.executed(), ['BEGIN', 'SELECT 1', 'COMMIT'])
+        self.assertEqual(stats.counters['commits'], 1)
+
+    async def test_transaction_is_rolled_back_on_error(self):
+        with self.assertRaises(ValueError):
+            async with transaction(self.conn):
+                raise ValueError
+        self.assertEqual(self.executed(), ['BEGIN', 'ROLLBACK'])
+        self.assertEqual(stats.counters['rollbacks'], 1)
+        self.assertEqual(stats.counters['commits'], 0)
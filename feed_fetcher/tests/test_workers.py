@@ -1,90 +1,546 @@
 import asyncio
-import datetime
-import re
+import hashlib
+import os
 from datetime import timedelta
 
 import asynctest
+import psycopg2
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
 from django.utils import timezone
 
-from feed_fetcher.tests.utils import get_cursor, get_session
-from feed_fetcher.workers import fill_queue, pull_data
+from apps.feeds.models import Entry, Feed, FeedItem
+from feed_fetcher import stats
+from feed_fetcher.tests.utils import get_cursor, get_session, \
+    get_connection, Pool
+from feed_fetcher.helpers import FeedParseError
+from feed_fetcher.scheduler import Scheduler
+from feed_fetcher.workers import fill_queue, pull_data, load_schedule, \
+    on_connection_create_end, on_connection_reuseconn, get_lease_owner, \
+    get_db_pool
 
 
 class FillQueueTestCase(asynctest.TestCase):
     async def setUp(self):
         self.test_feeds = [
-            (1, 'https://www.dachi.me/rss/news', False, timezone.now(), 60, 1)
+            (1, 'https://www.dachi.me/rss/news', False, timezone.now(), 60, 1,
+             None, None, None)
         ]
         self.cur = get_cursor(self.test_feeds)
-        self.data = asyncio.Queue()
+        self.data = asyncio.Queue(maxsize=10)
+        self.in_flight = {'https://www.dachi.me/rss/other'}
 
     async def test_tasks_are_added_to_the_queue(self):
-        await fill_queue(self.data, self.cur)
+        await fill_queue(self.data, self.cur, self.in_flight, 10)
         self.assertEqual(self.data.qsize(), 1)
         data = await self.data.get()
         self.cur.execute.assert_awaited()
         self.cur.fetchall.assert_awaited()
-        self.assertEqual(data[1], 'https://www.dachi.me/rss/news')
+        self.assertEqual(data[0], 'https://www.dachi.me/rss/news')
 
-    async def test_tasks_are_being_scheduled_correctly(self):
-        await fill_queue(self.data, self.cur)
+    async def test_feeds_are_grouped_by_url(self):
+        self.test_feeds.append(
+            (2, 'https://www.dachi.me/rss/news', False, timezone.now(), 60, 2,
+             None, None, None))
+        await fill_queue(self.data, self.cur, self.in_flight, 10)
         self.assertEqual(self.data.qsize(), 1)
-        data = await self.data.get()
-        self.cur.execute.assert_awaited()
-        self.cur.fetchall.assert_awaited()
-        scheduled_date = data[3] + timedelta(seconds=data[4])
-        scheduled_date_str = datetime.datetime.strftime(
-            scheduled_date, "%Y-%m-%d %H:%M:%S.%f")
-        query = (f"UPDATE feed SET scan_after = '{scheduled_date_str}' "
-                 f"WHERE id = 1")
-        cur_execute_args_list = self.cur.execute.await_args_list
-        self.assertEqual(len(cur_execute_args_list), 2)
-        executed_query = self.cur.execute.await_args_list[1][0][0]
-        executed_query = re.sub(r"\+\d{2}\:\d{2}'", r"'", executed_query)
-        self.assertEqual(query, executed_query)
+        url, feeds = await self.data.get()
+        self.assertEqual(url, 'https://www.dachi.me/rss/news')
+        self.assertEqual([feed[0] for feed in feeds], [1, 2])
+
+    async def test_feeds_are_claimed_in_single_statement(self):
+        await fill_queue(self.data, self.cur, self.in_flight, 10)
+        self.assertEqual(self.cur.execute.await_count, 2)
+        query = self.cur.execute.await_args_list[0][0][0]
+        self.assertTrue(query.startswith('PREPARE claim_feeds '))
+        self.assertIn('AS UPDATE feed SET', query)
+        self.assertIn('FOR UPDATE SKIP LOCKED', query)
+        self.assertIn('lease_expires < now()', query)
+        self.assertIn('WHERE id IN (SELECT id FROM feed WHERE link IN (',
+                      query)
+        self.assertIn('GROUP BY link ORDER BY min(scan_after) LIMIT $4',
+                      query)
+        query, params = self.cur.execute.await_args[0]
+        self.assertTrue(query.startswith('EXECUTE claim_feeds '))
+        self.assertEqual(params[0], get_lease_owner())
+        self.assertEqual(params[2], ['https://www.dachi.me/rss/other'])
+        self.assertEqual(params[3], 10)
+
+    async def test_queued_urls_are_tracked_in_flight(self):
+        await fill_queue(self.data, self.cur, self.in_flight, 10)
+        self.assertEqual(self.in_flight, {'https://www.dachi.me/rss/other',
+                                          'https://www.dachi.me/rss/news'})
+
+
+class LoadScheduleTestCase(asynctest.TestCase):
+    async def setUp(self):
+        self.now = timezone.now()
+        self.scheduler = Scheduler()
+
+    async def test_leased_feeds_are_scheduled_after_lease(self):
+        lease_expires = self.now + timedelta(seconds=300)
+        cur = get_cursor([(1, self.now, lease_expires, False),
+                          (2, self.now, None, False)])
+        await load_schedule(self.scheduler, cur)
+        self.assertEqual(self.scheduler.deadlines,
+                         {1: lease_expires, 2: self.now})
+
+    async def test_terminated_and_deleted_feeds_are_discarded(self):
+        self.scheduler.schedule(1, self.now)
+        self.scheduler.schedule(2, self.now)
+        cur = get_cursor([(1, self.now, None, True)])
+        await load_schedule(self.scheduler, cur, [1, 2])
+        self.assertEqual(len(self.scheduler), 0)
+        query = cur.execute.await_args_list[0][0][0]
+        self.assertIn('id = ANY($3)', query)
+        self.assertNotIn('hashtext', query)
+        query, params = cur.execute.await_args[0]
+        self.assertEqual(params[-1], [1, 2])
+
+    async def test_sharded_schedule_is_filtered_by_host(self):
+        cur = get_cursor([])
+        await load_schedule(Scheduler(shard=1, shards=4), cur)
+        query = cur.execute.await_args_list[0][0][0]
+        self.assertTrue(query.startswith('PREPARE load_schedule_sharded '))
+        self.assertIn('hashtext', query)
+        query, params = cur.execute.await_args[0]
+        self.assertEqual(params, [1, 4])
 
 
 class PullData(asynctest.TestCase):
     async def setUp(self):
         self.test_feeds = [
-            (1, 'https://www.dachi.me/rss/news', False, timezone.now(), 60, 1)
+            (1, 'https://www.dachi.me/rss/news', False, timezone.now(), 60, 1,
+             '"abc"', 'Sat, 28 Dec 2019 12:52:00 GMT', None)
         ]
         self.data = asyncio.Queue()
-        await self.data.put(self.test_feeds[0])
+        await self.data.put((self.test_feeds[0][1], self.test_feeds))
 
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
     @asynctest.patch('feed_fetcher.workers.terminate_feed')
     @asynctest.patch('feed_fetcher.workers.push_to_db')
     @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
-    @asynctest.patch('feed_fetcher.workers.aiohttp.ClientSession')
     async def test_success_request_leads_to_correct_calls(
-            self, mock_client_session, mock_parser, mock_db_insert,
-            mock_feed_termination
+            self, mock_parser, mock_db_insert, mock_feed_termination,
+            mock_release_feeds, mock_save_validators
     ):
         client, response = get_session("Dummy content", 200)
-        mock_client_session.return_value.__aenter__.side_effect = client
-        conn = asynctest.CoroutineMock()
-        await pull_data(self.data, conn)
+        mock_db_insert.return_value = 3
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        await pull_data(self.data, Pool(conn), client())
         self.assertEqual(self.data.qsize(), 0)
         response.assert_called_once()
         mock_parser.assert_awaited()
-        mock_db_insert.assert_awaited()
+        mock_db_insert.assert_awaited_with(
+            'https://www.dachi.me/rss/news', [(1, 1)],
+            mock_parser.return_value, cur, True)
         mock_feed_termination.assert_not_awaited()
+        # aiopg closes the cursor of the transaction when another is opened
+        conn.cursor.assert_called_once()
 
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
     @asynctest.patch('feed_fetcher.workers.terminate_feed')
     @asynctest.patch('feed_fetcher.workers.push_to_db')
     @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
-    @asynctest.patch('feed_fetcher.workers.aiohttp.ClientSession')
     async def test_back_off_mechanism(
-            self, mock_client_session, mock_parser, mock_db_insert,
-            mock_feed_termination
+            self, mock_parser, mock_db_insert, mock_feed_termination,
+            mock_release_feeds
     ):
         client, response = get_session("Dummy content", 400)
-        mock_client_session.return_value.__aenter__.side_effect = client
-        conn = asynctest.CoroutineMock()
-        await pull_data(self.data, conn)
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        await pull_data(self.data, Pool(conn), client())
         self.assertEqual(self.data.qsize(), 0)
         response.assert_called()
         self.assertEqual(response.call_count, 5)
         mock_parser.assert_not_awaited()
         mock_db_insert.assert_not_awaited()
         mock_feed_termination.assert_awaited()
+        mock_release_feeds.assert_awaited_with([1], cur)
+
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    async def test_feeds_are_rescheduled_on_completion(
+            self, mock_release_feeds
+    ):
+        rescheduled = [(1, timezone.now() + timedelta(seconds=60), False)]
+        mock_release_feeds.return_value = rescheduled
+        client, response = get_session("", 304)
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        url, feeds = await pull_data(self.data, Pool(conn), client())
+        self.assertEqual(url, 'https://www.dachi.me/rss/news')
+        self.assertEqual(feeds, rescheduled)
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.terminate_feed')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_not_modified_skips_parsing(
+            self, mock_parser, mock_db_insert, mock_feed_termination,
+            mock_release_feeds, mock_save_validators
+    ):
+        client, response = get_session("", 304)
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        await pull_data(self.data, Pool(conn), client())
+        response.assert_called_once()
+        headers = response.call_args[1]['headers']
+        self.assertEqual(headers['If-None-Match'], '"abc"')
+        self.assertEqual(headers['If-Modified-Since'],
+                         'Sat, 28 Dec 2019 12:52:00 GMT')
+        mock_parser.assert_not_awaited()
+        mock_db_insert.assert_not_awaited()
+        mock_save_validators.assert_not_awaited()
+        mock_feed_termination.assert_not_awaited()
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.terminate_feed')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_new_validators_are_saved(
+            self, mock_parser, mock_db_insert, mock_feed_termination,
+            mock_release_feeds, mock_save_validators
+    ):
+        client, response = get_session("Dummy content", 200,
+                                       {'ETag': '"def"'})
+        mock_db_insert.return_value = 0
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        await pull_data(self.data, Pool(conn), client())
+        mock_db_insert.assert_awaited()
+        mock_save_validators.assert_awaited_with(
+            [1], '"def"', None, hashlib.sha256(b'Dummy content').hexdigest(),
+            cur)
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.terminate_feed')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_unchanged_body_skips_parsing(
+            self, mock_parser, mock_db_insert, mock_feed_termination,
+            mock_release_feeds, mock_save_validators
+    ):
+        stats.counters.clear()
+        digest = hashlib.sha256(b'Dummy content').hexdigest()
+        feeds = [self.test_feeds[0][:8] + (digest,)]
+        self.data = asyncio.Queue()
+        await self.data.put((feeds[0][1], feeds))
+        client, response = get_session("Dummy content", 200,
+                                       {'ETag': '"abc"',
+                                        'Last-Modified': feeds[0][7]})
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        await pull_data(self.data, Pool(conn), client())
+        mock_parser.assert_not_awaited()
+        mock_db_insert.assert_not_awaited()
+        mock_save_validators.assert_not_awaited()
+        mock_release_feeds.assert_awaited_with([1], cur)
+        self.assertEqual(stats.counters['digest_hits'], 1)
+        self.assertEqual(stats.counters['digest_misses'], 0)
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_scan_is_committed_once(
+            self, mock_parser, mock_db_insert, mock_release_feeds,
+            mock_save_validators
+    ):
+        stats.counters.clear()
+        client, response = get_session("Dummy content", 200)
+        mock_db_insert.return_value = 3
+        cur = get_cursor([])
+        await pull_data(self.data, Pool(get_connection(cur)), client())
+        self.assertEqual([args[0][0] for args in cur.execute.await_args_list],
+                         ['BEGIN', 'COMMIT'])
+        mock_save_validators.assert_awaited()
+        mock_release_feeds.assert_awaited_once()
+        self.assertEqual(stats.counters['commits'], 1)
+        self.assertEqual(stats.counters['items_inserted'], 3)
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_failed_scan_is_rolled_back(
+            self, mock_parser, mock_db_insert, mock_release_feeds,
+            mock_save_validators
+    ):
+        stats.counters.clear()
+        client, response = get_session("Dummy content", 200)
+        mock_db_insert.side_effect = psycopg2.DataError('value too long')
+        rescheduled = [(1, timezone.now() + timedelta(seconds=60), False)]
+        mock_release_feeds.return_value = rescheduled
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        url, feeds = await pull_data(self.data, Pool(conn), client())
+        self.assertEqual(feeds, rescheduled)
+        self.assertEqual([args[0][0] for args in cur.execute.await_args_list],
+                         ['BEGIN', 'ROLLBACK'])
+        mock_save_validators.assert_not_awaited()
+        mock_release_feeds.assert_awaited_once_with([1], cur)
+        self.assertEqual(stats.counters['rollbacks'], 1)
+        self.assertEqual(stats.counters['items_inserted'], 0)
+
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_feeds_stay_leased_when_connection_is_lost(
+            self, mock_parser, mock_db_insert, mock_release_feeds
+    ):
+        client, response = get_session("Dummy content", 200)
+        mock_db_insert.side_effect = psycopg2.OperationalError(
+            'server closed the connection unexpectedly')
+        mock_release_feeds.side_effect = psycopg2.InterfaceError(
+            'connection already closed')
+        pool = Pool(get_connection(get_cursor([])))
+        url, feeds = await pull_data(self.data, pool, client())
+        self.assertEqual(feeds, [])
+        mock_release_feeds.assert_awaited_once()
+        self.assertEqual(pool.released, 1)
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.terminate_feed')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_malformed_feed_is_released(
+            self, mock_parser, mock_db_insert, mock_feed_termination,
+            mock_release_feeds, mock_save_validators
+    ):
+        stats.counters.clear()
+        client, response = get_session("<html><body></html>", 200)
+        mock_parser.side_effect = FeedParseError('mismatched tag')
+        rescheduled = [(1, timezone.now() + timedelta(seconds=60), False)]
+        mock_release_feeds.return_value = rescheduled
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        url, feeds = await pull_data(self.data, Pool(conn), client())
+        self.assertEqual(feeds, rescheduled)
+        response.assert_called_once()
+        mock_db_insert.assert_not_awaited()
+        mock_save_validators.assert_not_awaited()
+        mock_feed_termination.assert_not_awaited()
+        mock_release_feeds.assert_awaited_once_with([1], cur)
+        self.assertEqual(stats.counters['parse_errors'], 1)
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_items_are_handed_to_ingest_buffer(
+            self, mock_parser, mock_db_insert, mock_release_feeds,
+            mock_save_validators
+    ):
+        client, response = get_session("Dummy content", 200,
+                                       {'ETag': '"def"'})
+        mock_db_insert.return_value = 0
+        ingest = asynctest.MagicMock(put=asynctest.CoroutineMock())
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        await pull_data(self.data, Pool(conn), client(), ingest)
+        mock_db_insert.assert_awaited_with(
+            'https://www.dachi.me/rss/news', [(1, 1)],
+            mock_parser.return_value, cur, False)
+        mock_save_validators.assert_not_awaited()
+        ingest.put.assert_awaited_with(
+            'https://www.dachi.me/rss/news', [(1, 1)],
+            mock_parser.return_value.items,
+            ('"def"', None, hashlib.sha256(b'Dummy content').hexdigest()))
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_connection_is_returned_to_pool(
+            self, mock_parser, mock_db_insert, mock_release_feeds,
+            mock_save_validators
+    ):
+        stats.counters.clear()
+        client, response = get_session("Dummy content", 200)
+        mock_db_insert.return_value = 0
+        pool = Pool(get_connection(get_cursor([])), size=2)
+        await pull_data(self.data, pool, client())
+        self.assertEqual(pool.released, 1)
+        self.assertEqual(pool.freesize, 2)
+        self.assertEqual(stats.counters['pool_wait_count'], 1)
+        self.assertEqual(stats.counters['pool_in_use_peak'], 1)
+
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_scan_is_dropped_when_pool_is_exhausted(
+            self, mock_parser, mock_db_insert, mock_release_feeds
+    ):
+        stats.counters.clear()
+        client, response = get_session("Dummy content", 200)
+        pool = Pool(get_connection(get_cursor([])))
+
+        async def acquire():
+            await asyncio.sleep(1)
+
+        pool.acquire = acquire
+        with override_settings(FEED_DB_ACQUIRE_TIMEOUT=0.01):
+            url, feeds = await pull_data(self.data, pool, client())
+        self.assertEqual(feeds, [])
+        mock_db_insert.assert_not_awaited()
+        mock_release_feeds.assert_not_awaited()
+        self.assertEqual(stats.counters['pool_timeouts'], 1)
+
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_statement_timeout_rolls_back_scan(
+            self, mock_parser, mock_db_insert, mock_release_feeds
+    ):
+        stats.counters.clear()
+        client, response = get_session("Dummy content", 200)
+        mock_db_insert.side_effect = asyncio.TimeoutError()
+        rescheduled = [(1, timezone.now() + timedelta(seconds=60), False)]
+        mock_release_feeds.return_value = rescheduled
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        url, feeds = await pull_data(self.data, Pool(conn), client())
+        self.assertEqual(feeds, rescheduled)
+        self.assertEqual([args[0][0] for args in cur.execute.await_args_list],
+                         ['BEGIN', 'ROLLBACK'])
+        mock_release_feeds.assert_awaited_once_with([1], cur)
+        self.assertEqual(stats.counters['statement_timeouts'], 1)
+        self.assertEqual(stats.counters['pool_timeouts'], 0)
+
+
+class PullDataBodyTestCase(asynctest.TestCase):
+    async def setUp(self):
+        stats.counters.clear()
+        self.test_feeds = [
+            (1, 'https://www.nu.nl/rss/Algemeen', False, timezone.now(), 60,
+             1, None, None, None)
+        ]
+        self.data = asyncio.Queue()
+        await self.data.put((self.test_feeds[0][1], self.test_feeds))
+        file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'data/algemeen.xml')
+        with open(file_path, 'rb') as f:
+            self.body = f.read()
+
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_too_large_body_is_skipped(
+            self, mock_parser, mock_db_insert, mock_release_feeds
+    ):
+        client, response = get_session(self.body, 200)
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        with override_settings(FEED_MAX_BODY_SIZE=1024):
+            await pull_data(self.data, Pool(conn), client())
+        mock_parser.assert_not_awaited()
+        mock_db_insert.assert_not_awaited()
+        self.assertEqual(stats.counters['body_too_large'], 1)
+
+    @asynctest.patch('feed_fetcher.workers.save_validators')
+    @asynctest.patch('feed_fetcher.workers.release_feeds')
+    @asynctest.patch('feed_fetcher.workers.push_to_db')
+    @asynctest.patch('feed_fetcher.workers.get_feed_as_dict')
+    async def test_body_is_parsed_while_streamed(
+            self, mock_parser, mock_db_insert, mock_release_feeds,
+            mock_save_validators
+    ):
+        client, response = get_session(self.body, 200)
+        mock_db_insert.return_value = 3
+        cur = get_cursor([])
+        conn = get_connection(cur)
+        with override_settings(FEED_STREAMING_PARSE=True,
+                               FEED_CHUNK_SIZE=512):
+            await pull_data(self.data, Pool(conn), client())
+        mock_parser.assert_not_awaited()
+        feed_meta = mock_db_insert.await_args[0][2]
+        self.assertEqual(len(feed_meta.items), 3)
+        self.assertEqual(feed_meta.title, 'NU - Algemeen')
+
+
+class PullDataDBTestCase(TransactionTestCase):
+    """
+    Scans feeds through an aiopg pool of the test database, the scan is
+    committed by its own connection, so tests aren't run in a transaction
+    """
+
+    def setUp(self):
+        stats.counters.clear()
+        user = User.objects.create_user(username='testuser1',
+                                        password='qwerty2019')
+        self.feed = Feed.objects.create(
+            link='https://www.nu.nl/rss/Algemeen', ttl=60, user=user,
+            etag='"abc"', lease_owner=get_lease_owner(),
+            lease_expires=timezone.now() + timedelta(minutes=5))
+        file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 'data/algemeen.xml')
+        with open(file_path, 'rb') as f:
+            self.body = f.read()
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.pool = self.loop.run_until_complete(get_db_pool())
+
+    def tearDown(self):
+        self.pool.close()
+        self.loop.run_until_complete(self.pool.wait_closed())
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def scan(self, content, status, headers=None):
+        feed = self.feed
+        feeds = [(feed.id, feed.link, False, feed.scan_after, feed.ttl,
+                  feed.user_id, feed.etag, None, None)]
+
+        async def run():
+            data = asyncio.Queue()
+            await data.put((feed.link, feeds))
+            client, response = get_session(content, status, headers)
+            return await pull_data(data, self.pool, client())
+
+        with override_settings(FEED_PARSER_EXECUTOR=None,
+                               FEED_STREAMING_PARSE=False):
+            return self.loop.run_until_complete(run())
+
+    def test_scan_is_committed(self):
+        url, feeds = self.scan(self.body, 200, {'ETag': '"def"'})
+        self.assertEqual(url, self.feed.link)
+        self.assertEqual([feed[0] for feed in feeds], [self.feed.id])
+        self.assertEqual(stats.counters['commits'], 1)
+        self.assertEqual(stats.counters['rollbacks'], 0)
+        self.assertEqual(Entry.objects.filter(source=url).count(), 3)
+        self.assertEqual(FeedItem.objects.filter(feed=self.feed).count(), 3)
+        feed = Feed.objects.get(pk=self.feed.pk)
+        self.assertEqual(feed.title, 'NU - Algemeen')
+        self.assertEqual(feed.etag, '"def"')
+        self.assertEqual(feed.content_digest,
+                         hashlib.sha256(self.body).hexdigest())
+        self.assertIsNone(feed.lease_owner)
+        self.assertGreater(feed.scan_after, self.feed.scan_after)
+
+    def test_not_modified_feed_is_released(self):
+        url, feeds = self.scan('', 304)
+        self.assertEqual([feed[0] for feed in feeds], [self.feed.id])
+        self.assertEqual(stats.counters['commits'], 1)
+        self.assertFalse(Entry.objects.exists())
+        feed = Feed.objects.get(pk=self.feed.pk)
+        self.assertEqual(feed.etag, '"abc"')
+        self.assertIsNone(feed.lease_owner)
+        self.assertGreater(feed.scan_after, self.feed.scan_after)
+
+
+class ConnectionStatsTestCase(asynctest.TestCase):
+    def setUp(self):
+        stats.counters.clear()
+
+    async def test_connection_trace_callbacks_update_counters(self):
+        await on_connection_create_end(None, None, None)
+        await on_connection_reuseconn(None, None, None)
+        await on_connection_reuseconn(None, None, None)
+        self.assertEqual(stats.counters['connections_opened'], 1)
+        self.assertEqual(stats.counters['connections_reused'], 2)
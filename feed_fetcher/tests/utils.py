@@ -13,13 +13,61 @@ def get_cursor(test_feeds):
         fetchall=asynctest.CoroutineMock(return_value=test_feeds))
 
 
+def get_connection(cur):
+    """
+    Returns Connection Mock for aiopg
+
+    :param cur: Cursor mock returned by conn.cursor()
+    :return: Connection mock
+    """
+    conn = asynctest.MagicMock()
+    conn.cursor.return_value.__aenter__.return_value = cur
+    return conn
+
+
+class Pool:
+    """
+    Pool mock for aiopg handing out a single connection
+    """
+
+    def __init__(self, conn, size=1):
+        self.conn = conn
+        self.size = size
+        self.freesize = size
+        self.released = 0
+
+    async def acquire(self):
+        self.freesize -= 1
+        return self.conn
+
+    async def release(self, conn):
+        self.freesize += 1
+        self.released += 1
+
+
+class StreamReader:
+    def __init__(self, body):
+        self.body = body
+
+    async def iter_chunked(self, n):
+        for idx in range(0, len(self.body), n):
+            yield self.body[idx:idx + n]
+
+
 class ClientResponse:
     content = None
+    content_length = None
     status = None
+    headers = None
 
-    def __init__(self, content, status):
-        self.content = content
+    def __init__(self, content, status, headers=None):
+        if isinstance(content, str):
+            content = content.encode()
+        self.body = content
+        self.content = StreamReader(content)
+        self.content_length = len(content)
         self.status = status
+        self.headers = headers or dict()
 
     async def __aenter__(self):
         return self
@@ -28,18 +76,19 @@ class ClientResponse:
         return None
 
     async def text(self):
-        return self.content
+        return self.body.decode()
 
 
-def get_session(content, status):
+def get_session(content, status, headers=None):
     """
     Returns mock for aiohttp client
 
     :param content: response.content
     :param status: response.status
+    :param headers: response.headers
     :return: session and response mock
     """
-    resp = ClientResponse(content, status)
+    resp = ClientResponse(content, status, headers)
     response = asynctest.MagicMock(return_value=resp)
     session = asynctest.MagicMock()
     session.return_value.get.side_effect = response
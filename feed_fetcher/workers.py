@@ -1,126 +1,619 @@
+import os
+import time
+import hashlib
+import functools
+import contextlib
+import socket
 import datetime
 import aiopg
 import aiohttp
 import asyncio
+import psycopg2
 from urllib.parse import urlparse
 from aiohttp import ClientConnectionError
 
 from django.conf import settings
 from django.utils import timezone
 
-from feed_fetcher.helpers import get_feed_as_dict, push_to_db
+from feed_fetcher import stats
+from feed_fetcher.helpers import get_feed_as_dict, push_to_db, FeedParser, \
+    FeedParseError
+from feed_fetcher.scheduler import Scheduler
+from feed_fetcher.statements import Statement, transaction
 
 
-async def get_db_pool():
+def get_dsn() -> str:
     db = settings.DATABASES['default']
-    dsn = (f'dbname={db["NAME"]} user={db["USER"]} password={db["PASSWORD"]} '
-           f'host={db["HOST"]} port={db["PORT"]}')
-    return await aiopg.create_pool(dsn)
+    return (f'dbname={db["NAME"]} user={db["USER"]} '
+            f'password={db["PASSWORD"]} host={db["HOST"]} port={db["PORT"]}')
+
+
+async def get_db_pool():
+    """
+    Creates DB connection pool shared by the tasks of a fetcher process
+
+    :return: aiopg Pool
+    """
+    return await aiopg.create_pool(
+        get_dsn(), minsize=settings.FEED_DB_POOL_MIN_SIZE,
+        maxsize=settings.FEED_DB_POOL_MAX_SIZE)
+
+
+class PoolTimeout(asyncio.TimeoutError):
+    """
+    No connection of the pool became free in time
+
+    Told apart from timeouts of statements run on an acquired connection.
+    """
+
+
+@contextlib.asynccontextmanager
+async def acquire(pool):
+    """
+    Holds connection of the pool for a unit of work
+
+    Waits for a free connection at most FEED_DB_ACQUIRE_TIMEOUT seconds.
+    Waiting time, timeouts and the most connections in use are counted.
+
+    :param pool: aiopg Pool
+    :return: DB connection
+    :raise PoolTimeout: No connection became free in time
+    """
+    started = time.time()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(),
+                                      settings.FEED_DB_ACQUIRE_TIMEOUT)
+    except asyncio.TimeoutError:
+        stats.incr('pool_timeouts')
+        raise PoolTimeout()
+    stats.observe('pool_wait', time.time() - started)
+    stats.peak('pool_in_use', pool.size - pool.freesize)
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
+
+
+async def on_connection_create_end(session, ctx, params):
+    """
+    Counts new connections established by the HTTP session
+    """
+    stats.incr('connections_opened')
+
+
+async def on_connection_reuseconn(session, ctx, params):
+    """
+    Counts keep-alive connections reused by the HTTP session
+    """
+    stats.incr('connections_reused')
+
+
+async def get_http_session():
+    """
+    Creates HTTP session shared by all workers of the process
 
+    Connections are pooled and kept alive between pulls, so feeds hosted on
+    the same server reuse already established TCP/TLS connections.
 
-async def terminate_feed(feed_id, conn):
+    :return: aiohttp ClientSession
+    """
+    connector = aiohttp.TCPConnector(
+        limit=settings.FEED_HTTP_LIMIT,
+        limit_per_host=settings.FEED_HTTP_LIMIT_PER_HOST,
+        ttl_dns_cache=settings.FEED_HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=settings.FEED_HTTP_KEEPALIVE_TIMEOUT)
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+    return aiohttp.ClientSession(connector=connector,
+                                 trace_configs=[trace_config])
+
+
+TERMINATE_FEEDS = Statement(
+    'terminate_feeds', ('int[]',),
+    'UPDATE feed SET terminated = TRUE WHERE id = ANY($1)')
+
+SAVE_VALIDATORS = Statement(
+    'save_validators', ('varchar', 'varchar', 'varchar', 'int[]'),
+    'UPDATE feed SET etag = $1::varchar(200), '
+    'last_modified = $2::varchar(100), content_digest = $3 '
+    'WHERE id = ANY($4)')
+
+RELEASE_FEEDS = Statement(
+    'release_feeds', ('int[]', 'varchar'),
+    "UPDATE feed SET scan_after = now() + ttl * interval '1 second', "
+    "lease_owner = NULL, lease_expires = NULL "
+    "WHERE id = ANY($1) AND lease_owner = $2 "
+    "RETURNING id, scan_after, terminated")
+
+
+async def terminate_feed(feed_ids, cur):
     """
     Sets Feed flag terminated true after set of failures
 
-    :param feed_id: Feed ID
-    :param conn: DB connection
+    :param feed_ids: IDs of feeds subscribed to the failing url
+    :param cur: DB cursor
+    :return: None
+    """
+    await TERMINATE_FEEDS.execute(cur, (feed_ids,))
+
+
+async def save_validators(feed_ids, etag, last_modified, content_digest,
+                          cur):
+    """
+    Stores HTTP cache validators and digest of the last processed document
+
+    :param feed_ids: IDs of feeds subscribed to the url
+    :param etag: ETag response header
+    :param last_modified: Last-Modified response header
+    :param content_digest: SHA-256 hex digest of the body
+    :param cur: DB cursor
     :return: None
     """
-    async with conn.cursor() as cur:
-        query = f'UPDATE feed SET terminated = TRUE WHERE id = {feed_id}'
-        await cur.execute(query)
+    await SAVE_VALIDATORS.execute(
+        cur, (etag, last_modified, content_digest, feed_ids))
+
+
+def shard_filter(shards, shard_param) -> str:
+    """
+    Returns SQL condition selecting feeds of a fetcher process
+
+    Feeds are sharded by host, so connections kept alive to a host are
+    reused by the single process fetching from it.
+
+    :param shards: Number of fetcher processes
+    :param shard_param: Position of the shard parameter, followed by shards
+    :return: SQL condition
+    """
+    if shards < 2:
+        return ''
+    return ("AND mod(abs(hashtext(split_part(split_part(link, '://', 2), "
+            f"'/', 1))::bigint), ${shard_param + 1}) = ${shard_param} ")
+
+
+def get_lease_owner() -> str:
+    """
+    Identifies current fetcher process in feed leases
+
+    :return: Lease owner
+    """
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+async def release_feeds(feed_ids, cur):
+    """
+    Reschedules processed feeds and releases their leases
 
+    Next scan is calculated from the completion time, so feeds which were
+    overdue are not due again right after they were fetched.
 
-async def fill_queue(data: asyncio.Queue, cur):
+    :param feed_ids: Feed IDs
+    :param cur: DB cursor
+    :return: List of (Feed ID, next scan datetime, terminated)
     """
-    Adds feeds to the queue
+    await RELEASE_FEEDS.execute(cur, (feed_ids, get_lease_owner()))
+    return await cur.fetchall()
+
+
+@functools.lru_cache(maxsize=None)
+def get_claim_statement(shards) -> Statement:
+    """
+    Returns statement claiming due feeds
+
+    Every subscription of a due url is claimed together with the due ones,
+    so they are fetched and rescheduled together and their scan times line
+    up after the first scan. Parameters are lease owner, lease seconds, urls
+    in flight, limit of urls, shard and shards.
+
+    :param shards: Number of fetcher processes
+    :return: Statement
+    """
+    sharded = shards > 1
+    return Statement(
+        'claim_feeds_sharded' if sharded else 'claim_feeds',
+        ('varchar', 'int', 'varchar[]', 'int', 'int', 'int'),
+        "UPDATE feed SET lease_owner = $1, "
+        "lease_expires = now() + $2 * interval '1 second' "
+        "WHERE id IN ("
+        "SELECT id FROM feed WHERE link IN ("
+        "SELECT link FROM feed "
+        "WHERE NOT terminated AND scan_after <= now() "
+        "AND (lease_expires IS NULL OR lease_expires < now()) "
+        "AND link <> ALL($3) "
+        f"{shard_filter(shards, 5)}"
+        "GROUP BY link ORDER BY min(scan_after) LIMIT $4) "
+        "AND NOT terminated "
+        "AND (lease_expires IS NULL OR lease_expires < now()) "
+        "FOR UPDATE SKIP LOCKED) "
+        "RETURNING id, link, terminated, scan_after, ttl, user_id, etag, "
+        "last_modified, content_digest")
+
+
+@functools.lru_cache(maxsize=None)
+def get_schedule_statement(shards, by_ids) -> Statement:
+    """
+    Returns statement loading next scan times of feeds
+
+    Parameters are shard, shards and, when loading given feeds, their IDs.
+
+    :param shards: Number of fetcher processes
+    :param by_ids: Load given feeds instead of all feeds
+    :return: Statement
+    """
+    name = 'load_feeds_schedule' if by_ids else 'load_schedule'
+    if shards > 1:
+        name += '_sharded'
+    condition = 'id = ANY($3)' if by_ids else 'NOT terminated'
+    return Statement(
+        name, ('int', 'int', 'int[]') if by_ids else ('int', 'int'),
+        f'SELECT id, scan_after, lease_expires, terminated FROM feed '
+        f'WHERE {condition} {shard_filter(shards, 1)}')
+
+
+async def fill_queue(data: asyncio.Queue, cur, in_flight: set, limit,
+                     shard=0, shards=1):
+    """
+    Claims due feeds and adds them to the queue
+
+    Feeds are claimed by a single statement which leases them to the current
+    process. Rows locked by other fetchers are skipped and leases left by
+    crashed fetchers are reclaimed once expired, so any number of fetchers can
+    run in parallel. All subscriptions of a due url are claimed, including
+    ones which aren't due yet, and grouped by url, so every document is
+    queued once together with all the feeds subscribed to it. Feeds of urls
+    which are already queued or being fetched are not claimed.
 
     :param data: Queue
     :param cur: DB Cursor
-    :return: None
+    :param in_flight: Urls queued or being fetched
+    :param limit: Maximum number of urls to claim
+    :param shard: Index of the fetcher process
+    :param shards: Number of fetcher processes
+    :return: Claimed feeds
     """
-    query = (f"SELECT id, link, terminated, scan_after, ttl, user_id "
-             f"FROM feed WHERE (scan_after <= '{timezone.now()}' OR "
-             f"scan_after IS NULL ) AND terminated IS NOT TRUE")
-    await cur.execute(query)
+    await get_claim_statement(shards).execute(
+        cur, (get_lease_owner(), settings.FEED_LEASE_SECONDS, list(in_flight),
+              limit, shard, shards))
     feeds = await cur.fetchall()
+    subscriptions = dict()
     for feed in feeds:
-        feed_id, url, terminated, scan_after, ttl, uid = feed
-        scan_after = scan_after + datetime.timedelta(seconds=ttl)
-        query = (f"UPDATE feed SET scan_after = '{scan_after}' "
-                 f"WHERE id = {feed_id}")
-        await cur.execute(query)
-        await data.put(feed)
+        subscriptions.setdefault(feed[1], list()).append(feed)
+    for url, url_feeds in subscriptions.items():
+        in_flight.add(url)
+        data.put_nowait((url, url_feeds))
+    return feeds
+
+
+async def load_schedule(scheduler: Scheduler, cur, feed_ids=None,
+                        not_before=None):
+    """
+    Loads next scan times of feeds into the scheduler
+
+    :param scheduler: Scheduler
+    :param cur: DB Cursor
+    :param feed_ids: Feed IDs to refresh, all feeds are reloaded when None
+    :param not_before: Earliest allowed scan time
+    :return: None
+    """
+    params = [scheduler.shard, scheduler.shards]
+    if feed_ids is None:
+        scheduler.clear()
+    else:
+        for feed_id in feed_ids:
+            scheduler.discard(feed_id)
+        params.append(list(feed_ids))
+    statement = get_schedule_statement(scheduler.shards, feed_ids is not None)
+    await statement.execute(cur, params)
+    for feed_id, scan_after, lease_expires, terminated in await cur.fetchall():
+        if terminated:
+            continue
+        when = max(filter(None, (scan_after, lease_expires, not_before)))
+        scheduler.schedule(feed_id, when)
+
+
+async def read_body(response):
+    """
+    Reads response body limited to FEED_MAX_BODY_SIZE bytes
+
+    :param response: HTTP response
+    :return: Body or None when it exceeds the limit
+    """
+    max_size = settings.FEED_MAX_BODY_SIZE
+    if response.content_length and response.content_length > max_size:
+        return None
+    body = bytearray()
+    async for chunk in response.content.iter_chunked(
+            settings.FEED_CHUNK_SIZE):
+        body.extend(chunk)
+        if len(body) > max_size:
+            return None
+    return bytes(body)
+
+
+async def stream_feed(response, service_name, hasher):
+    """
+    Parses response body while it is being received
+
+    Items are parsed and released chunk by chunk, so the whole document is
+    never kept in memory. It's meant for hosts short of memory only: chunks
+    are parsed on the event loop regardless of FEED_PARSER_EXECUTOR, since
+    parser state can't be handed between processes, and the digest is only
+    known once the document is parsed, so unchanged documents are parsed
+    in full as well.
+
+    :param response: HTTP response
+    :param service_name: Feed host
+    :param hasher: Hash object the body is digested into
+    :return: Parsed feed or None when body exceeds FEED_MAX_BODY_SIZE bytes
+    """
+    max_size = settings.FEED_MAX_BODY_SIZE
+    if response.content_length and response.content_length > max_size:
+        return None
+    parser = FeedParser(service_name)
+    size = 0
+    started = time.time()
+    async for chunk in response.content.iter_chunked(
+            settings.FEED_CHUNK_SIZE):
+        size += len(chunk)
+        if size > max_size:
+            return None
+        hasher.update(chunk)
+        parser.feed(chunk)
+    res = parser.close()
+    stats.observe('stream', time.time() - started)
+    return res
+
+
+async def release_rolled_back(url, feed_ids, conn) -> list:
+    """
+    Releases feeds of a scan which was rolled back
+
+    :param url: Feed url
+    :param feed_ids: IDs of the feeds subscribed to the url
+    :param conn: DB connection
+    :return: List of (Feed ID, next scan datetime, terminated), empty when
+        the connection is lost
+    """
+    try:
+        async with conn.cursor() as cur:
+            return await release_feeds(feed_ids, cur)
+    except (psycopg2.Error, asyncio.TimeoutError) as e:
+        # Feeds stay leased and are picked up again once the lease expires
+        print(f'Feed {url} not released: {e}')
+        return []
 
 
-async def pull_data(data, conn):
+async def pull_data(data, pool, session, ingest=None):
     """
     Gets tasks from the queue, pulls feed content from the url, updates db
 
+    Every url is pulled and parsed once and the result is applied to all
+    feeds subscribed to it. Requests are conditional, when the server answers
+    304 Not Modified the feed is considered scanned and neither parsed nor
+    written to db. Body identical to the last processed one, recognized by
+    its digest, is not written to db either. All writes of a scan, meta
+    data, items, validators and the reschedule, are committed together in
+    one transaction. When it fails the scan is rolled back and the feeds are
+    only rescheduled. With an ingest buffer items and validators are handed
+    over to it once the transaction is committed. A connection of the pool
+    is held only while the scan is written, not while the url is fetched.
+
     :param data: Queue
-    :param conn: DB Connection
-    :return: None
+    :param pool: DB connection pool
+    :param session: Shared HTTP session
+    :param ingest: Ingest buffer
+    :return: Url and list of (Feed ID, next scan datetime, terminated)
     """
-    feed_id, url, terminated, scan_after, ttl, uid = await data.get()
+    url, feeds = await data.get()
+    feed_ids = [feed[0] for feed in feeds]
+    subscriptions = [(feed[0], feed[5]) for feed in feeds]
+    validators = {(feed[6], feed[7], feed[8]) for feed in feeds}
+    etag, last_modified, content_digest = None, None, None
+    if len(validators) == 1:
+        # Subscriptions fetched before share the validators, new ones don't
+        etag, last_modified, content_digest = validators.pop()
+    headers = dict()
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    scanned = None
+    new_validators = None
     retries = 5
     current_retry = 0
     backoff_factor = 0.1
-    async with aiohttp.ClientSession() as session:
-        while current_retry < retries:
-            try:
-                async with session.get(url) as response:
-                    code = response.status
-                    if code == 200:
-                        text = await response.text()
-                        url_prsd = urlparse(url)
-                        feed_dict = await get_feed_as_dict(text,
-                                                           url_prsd.hostname)
-                        await push_to_db(feed_id, feed_dict, conn, uid)
+    while current_retry < retries:
+        try:
+            async with session.get(url, headers=headers) as response:
+                code = response.status
+                if code == 304:
+                    stats.incr('not_modified')
+                    break
+                if code == 200:
+                    url_prsd = urlparse(url)
+                    hasher = hashlib.sha256()
+                    body = None
+                    if settings.FEED_STREAMING_PARSE:
+                        feed_meta = await stream_feed(
+                            response, url_prsd.hostname, hasher)
+                        too_large = feed_meta is None
+                    else:
+                        body = await read_body(response)
+                        too_large = body is None
+                        if body is not None:
+                            hasher.update(body)
+                    if too_large:
+                        print(f'Feed {url} exceeds '
+                              f'{settings.FEED_MAX_BODY_SIZE} bytes')
+                        stats.incr('body_too_large')
+                        break
+                    new_digest = hasher.hexdigest()
+                    new_etag = response.headers.get('ETag')
+                    new_last_modified = response.headers.get('Last-Modified')
+                    if new_digest == content_digest:
+                        stats.incr('digest_hits')
+                        if ((new_etag, new_last_modified) !=
+                                (etag, last_modified)):
+                            new_validators = (new_etag, new_last_modified,
+                                              new_digest)
                         break
-            except ClientConnectionError:
-                pass
-            if current_retry > 0:
-                current_wait = backoff_factor * 2 ** (current_retry - 1)
-                if current_wait > 1:
-                    # Maximum wait between waits is 1 second
-                    current_wait = 1
-                await asyncio.sleep(current_wait)
-            current_retry += 1
-    if current_retry == retries:
-        await terminate_feed(feed_id, conn)
+                    stats.incr('digest_misses')
+                    if body is not None:
+                        feed_meta = await get_feed_as_dict(
+                            body, url_prsd.hostname)
+                    stats.incr('documents_parsed')
+                    scanned = feed_meta
+                    new_validators = (new_etag, new_last_modified, new_digest)
+                    break
+        except ClientConnectionError:
+            pass
+        except FeedParseError as e:
+            # Feeds are rescheduled, the document is fetched again next time
+            print(f'Feed {url} is malformed: {e}')
+            stats.incr('parse_errors')
+            break
+        if current_retry > 0:
+            current_wait = backoff_factor * 2 ** (current_retry - 1)
+            if current_wait > 1:
+                # Maximum wait between waits is 1 second
+                current_wait = 1
+            await asyncio.sleep(current_wait)
+        current_retry += 1
+    buffered = ingest is not None and scanned is not None
+    inserted = 0
+    try:
+        async with acquire(pool) as conn:
+            try:
+                async with transaction(conn) as cur:
+                    if scanned is not None:
+                        inserted = await push_to_db(
+                            url, subscriptions, scanned, cur, not buffered)
+                    if new_validators is not None and not buffered:
+                        await save_validators(feed_ids, *new_validators,
+                                              cur)
+                    if current_retry == retries:
+                        await terminate_feed(feed_ids, cur)
+                    released = await release_feeds(feed_ids, cur)
+            except psycopg2.Error as e:
+                print(f'Feed {url} scan rolled back: {e}')
+                return url, await release_rolled_back(url, feed_ids, conn)
+            except asyncio.TimeoutError:
+                # aiopg cancels statements running longer than the pool
+                # timeout, the connection stays usable
+                print(f'Feed {url} scan rolled back, statement timed out')
+                stats.incr('statement_timeouts')
+                return url, await release_rolled_back(url, feed_ids, conn)
+    except PoolTimeout:
+        # Feeds stay leased and are picked up again once the lease expires
+        print(f'Feed {url} scan dropped, no DB connection became free')
+        return url, []
+    if buffered:
+        await ingest.put(url, subscriptions, scanned.items, new_validators)
+    else:
+        stats.incr('items_inserted', inserted)
+    return url, released
+
+
+async def forward_notifies(conn, scheduler: Scheduler):
+    """
+    Passes feed change notifications to the scheduler
+
+    :param conn: DB connection listening to the notify channel
+    :param scheduler: Scheduler
+    :return: None
+    """
+    while True:
+        notify = await conn.notifies.get()
+        stats.incr('notifications')
+        scheduler.notify(int(notify.payload))
 
 
-async def collect_tasks(data: asyncio.Queue):
+async def collect_tasks(data: asyncio.Queue, scheduler: Scheduler, pool):
     """
     Adds tasks to the queue
 
-    :param data: Queue
+    Next scan times are kept in an in-memory heap and the collector sleeps
+    until the earliest of them. Changes made by the web application arrive
+    through LISTEN/NOTIFY, the whole schedule is reloaded periodically to
+    pick up changes made by other fetchers. Feeds are claimed only while the
+    queue has free slots, claimed feeds leave the heap until the workers
+    report them completed. The collector holds one connection of the pool
+    for its whole life, notifications are delivered to the listening
+    connection.
+
+    :param data: Bounded queue
+    :param scheduler: Scheduler
+    :param pool: DB connection pool
     :return: None
     """
     print('Collect Tasks Worker Started')
-    pool = await get_db_pool()
-    async with pool.acquire() as conn:
+    loop = asyncio.get_event_loop()
+    retry_delay = datetime.timedelta(seconds=settings.FEED_SCHEDULER_RETRY)
+    async with acquire(pool) as conn:
         async with conn.cursor() as cur:
-            while True:
-                await fill_queue(data, cur)
-                await asyncio.sleep(0.2)
+            await cur.execute(f'LISTEN {settings.FEED_NOTIFY_CHANNEL}')
+            listener = asyncio.ensure_future(forward_notifies(conn, scheduler))
+            resync_at = loop.time()
+            try:
+                while True:
+                    if loop.time() >= resync_at:
+                        await load_schedule(scheduler, cur)
+                        resync_at = (loop.time() +
+                                     settings.FEED_SCHEDULER_RESYNC)
+                    if scheduler.changed:
+                        changed = set(scheduler.changed)
+                        scheduler.changed.clear()
+                        await load_schedule(scheduler, cur, changed)
+                    now = timezone.now()
+                    capacity = data.maxsize - data.qsize()
+                    next_deadline = scheduler.next_deadline()
+                    if capacity > 0 and next_deadline and next_deadline <= now:
+                        due = scheduler.pop_due(now)
+                        feeds = await fill_queue(
+                            data, cur, scheduler.in_flight, capacity,
+                            scheduler.shard, scheduler.shards)
+                        claimed = {feed[0] for feed in feeds}
+                        for feed_id in claimed:
+                            # Rescheduled once their url is fetched
+                            scheduler.discard(feed_id)
+                        not_before = None
+                        if len({feed[1] for feed in feeds}) < capacity:
+                            # Left overs are in flight or claimed by others
+                            not_before = timezone.now() + retry_delay
+                        await load_schedule(
+                            scheduler, cur,
+                            [feed_id for feed_id in due
+                             if feed_id not in claimed],
+                            not_before)
+                        continue
+                    timeout = resync_at - loop.time()
+                    if capacity > 0 and next_deadline:
+                        timeout = min(timeout,
+                                      (next_deadline - now).total_seconds())
+                    await scheduler.wait(timeout)
+            finally:
+                listener.cancel()
 
 
-async def worker(data: asyncio.Queue, num):
+async def worker(data: asyncio.Queue, session, scheduler: Scheduler, pool,
+                 num, ingest=None):
     """
     Consumes tasks from the queue and process them
 
     :param data: Queue
+    :param session: Shared HTTP session
+    :param scheduler: Scheduler
+    :param pool: Shared DB connection pool
     :param num: Worker number (for logging)
+    :param ingest: Ingest buffer items are written through
     :return: None
     """
     print(f'Worker [{num}] Started')
-    pool = await get_db_pool()
-    async with pool.acquire() as conn:
-        while True:
-            await pull_data(data, conn)
-            queue_size = data.qsize()
-            if queue_size:
-                await asyncio.sleep(0)
-            else:
-                await asyncio.sleep(0.2)
+    while True:
+        url, feeds = await pull_data(data, pool, session, ingest)
+        scheduler.complete(url, feeds)
+        queue_size = data.qsize()
+        if queue_size:
+            await asyncio.sleep(0)
+        else:
+            await asyncio.sleep(0.2)
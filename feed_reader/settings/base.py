@@ -152,3 +152,94 @@ MEDIA_ROOT = os.path.join(BASE_DIR, '../media')
 FEED_SCAN_INTERVAL = 60
 
 FEED_WORKERS_COUNT = 9
+
+# Shared HTTP connection pool of the feed fetcher
+
+FEED_HTTP_LIMIT = 100
+
+FEED_HTTP_LIMIT_PER_HOST = 4
+
+FEED_HTTP_DNS_CACHE_TTL = 300
+
+FEED_HTTP_KEEPALIVE_TIMEOUT = 30
+
+# DB connection pool shared by the tasks of a fetcher process. Workers hold a
+# connection only while writing a scan, the task collector holds one for
+# LISTEN. Scans waiting longer than FEED_DB_ACQUIRE_TIMEOUT seconds for a
+# connection are dropped and retried once their lease expires
+
+FEED_DB_POOL_MIN_SIZE = 1
+
+FEED_DB_POOL_MAX_SIZE = 5
+
+FEED_DB_ACQUIRE_TIMEOUT = 10
+
+# Seconds between fetcher stats reports
+
+FEED_STATS_INTERVAL = 60
+
+# Seconds feeds claimed by a fetcher are leased for
+
+FEED_LEASE_SECONDS = 300
+
+# Channel the web application notifies the fetcher about feed changes on
+
+FEED_NOTIFY_CHANNEL = 'feed_changed'
+
+# Seconds between full reloads of the fetcher schedule and delay before
+# retrying feeds claimed by another fetcher
+
+FEED_SCHEDULER_RESYNC = 300
+
+FEED_SCHEDULER_RETRY = 1
+
+# Maximum number of urls waiting in the fetcher queue
+
+FEED_QUEUE_SIZE = 50
+
+# Feeds are parsed off the event loop in a 'process' or 'thread' pool,
+# None parses them on the event loop. Pool size defaults to number of CPUs
+
+FEED_PARSER_EXECUTOR = 'process'
+
+FEED_PARSER_WORKERS = None
+
+# XML backend of the feed parser, 'lxml' or 'etree'. lxml falls back to the
+# standard library etree when it isn't installed
+
+FEED_PARSER_ENGINE = 'lxml'
+
+# Feeds larger than FEED_MAX_BODY_SIZE bytes are skipped. With
+# FEED_STREAMING_PARSE the body is parsed on the event loop chunk by chunk
+# while it is received, otherwise it's read whole and parsed in the executor.
+# Streaming saves memory only, it ignores FEED_PARSER_EXECUTOR and parses
+# unchanged documents too, which are otherwise skipped by their digest
+
+FEED_MAX_BODY_SIZE = 10 * 1024 * 1024
+
+FEED_CHUNK_SIZE = 64 * 1024
+
+FEED_STREAMING_PARSE = False
+
+# Parsed items of all feeds are buffered and written together with COPY,
+# once FEED_INGEST_FLUSH_ROWS rows are buffered or every FEED_INGEST_FLUSH_MS
+# milliseconds. Workers wait while FEED_INGEST_MAX_ROWS rows are buffered
+
+FEED_INGEST_BUFFER = True
+
+FEED_INGEST_FLUSH_ROWS = 1000
+
+FEED_INGEST_FLUSH_MS = 500
+
+FEED_INGEST_MAX_ROWS = 10000
+
+# feed_item is partitioned by month. manage_feed_item_partitions creates
+# partitions FEED_ITEM_PARTITIONS_AHEAD months ahead and drops partitions
+# older than FEED_ITEM_RETENTION_MONTHS months, favorited and commented items
+# are kept. Stored entries older than the retention aren't delivered again,
+# they are deleted once their source has no subscribers.
+# None disables retention
+
+FEED_ITEM_PARTITIONS_AHEAD = 3
+
+FEED_ITEM_RETENTION_MONTHS = 12